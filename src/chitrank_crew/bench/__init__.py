@@ -0,0 +1 @@
+"""Offline benchmark suite for the memory, RAG and short-term store hot paths."""
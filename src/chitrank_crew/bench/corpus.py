@@ -0,0 +1,106 @@
+"""
+Synthetic corpus generator (TXT and PDF) for the benchmarks.
+
+Documents are built from a fixed vocabulary plus identifier-like tokens (config
+keys, error codes, file names) so both semantic and exact-match lookups have
+something to find. Output is fully determined by the seed.
+"""
+import os, random
+from typing import List
+
+WORDS = (
+    "password reset token expiry email magic link session user account login security audit "
+    "service deploy pipeline staging production rollback canary metrics alert latency cache "
+    "database migration schema index query replica backup restore queue worker retry timeout "
+    "request response header cookie signature hash salt rotate secret vault policy role access "
+    "test unit integration regression coverage fixture mock contract load stress flaky build "
+    "release version artifact container image cluster node scaling throughput error budget"
+).split()
+IDENTIFIERS = (
+    "AUTH_TOKEN_TTL", "RESET_LINK_EXPIRY_MINUTES", "SMTP_RELAY_HOST", "E4012", "E5003", "ERR_TOKEN_REUSED",
+    "auth-service.yaml", "deploy/staging.tf", "tests/test_reset_flow.py", "MAX_LOGIN_ATTEMPTS", "X-Request-Id",
+)
+QUESTIONS = (
+    "how long is the password reset token valid",
+    "rollback strategy for a failed staging deploy",
+    "which tests cover the magic link email flow",
+    "cache invalidation after schema migration",
+    "alerting thresholds for login latency",
+)
+
+
+def make_text(rng: random.Random, n_words: int) -> str:
+    words = []
+    for i in range(n_words):
+        if i and i % 12 == 0:
+            words[-1] += "."
+        words.append(rng.choice(IDENTIFIERS) if rng.random() < 0.03 else rng.choice(WORDS))
+    return " ".join(words) + "."
+
+
+def write_pdf(path: str, text: str, words_per_line: int = 12, lines_per_page: int = 45) -> None:
+    """Write a minimal single-font PDF whose pages contain `text` (extractable by pypdf)."""
+    words = text.split()
+    lines = [" ".join(words[i:i + words_per_line]) for i in range(0, len(words), words_per_line)] or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    def esc(s: str) -> str:
+        return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    # Object layout: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page_lines in pages:
+        page_num, content_num = len(objects) + 1, len(objects) + 2
+        kids.append(f"{page_num} 0 R")
+        stream = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({esc(l)}) '" for l in page_lines) + " ET"
+        data = stream.encode("latin-1", errors="replace")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_num} 0 R >>".encode())
+        objects.append(b"<< /Length " + str(len(data)).encode() + b" >>\nstream\n" + data + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(directory: str, n_files: int, words_per_file: int = 600, pdf_ratio: float = 0.25,
+                    seed: int = 0) -> List[str]:
+    """Write `n_files` documents (a `pdf_ratio` share of them as PDF) and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        text = make_text(rng, words_per_file)
+        if rng.random() < pdf_ratio:
+            path = os.path.join(directory, f"doc_{i:05d}.pdf")
+            write_pdf(path, text)
+        else:
+            path = os.path.join(directory, f"doc_{i:05d}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        paths.append(path)
+    return paths
+
+
+def sample_queries(n: int, seed: int = 0) -> List[str]:
+    """Mix of natural-language questions and identifier lookups."""
+    rng = random.Random(seed + 1)
+    out = []
+    for i in range(n):
+        if i % 4 == 3:
+            out.append(rng.choice(IDENTIFIERS))
+        elif i % 4 == 2:
+            out.append(make_text(rng, 8).rstrip("."))
+        else:
+            out.append(rng.choice(QUESTIONS))
+    return out
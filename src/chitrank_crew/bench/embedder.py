@@ -0,0 +1,58 @@
+"""
+Embedders for offline benchmarking.
+
+`HashEmbedder` is a deterministic stand-in for all-MiniLM-L6-v2 (same 384-dim
+output, same `encode(list) -> ndarray` interface) built from signed feature
+hashing of word unigrams/bigrams. It needs no network and no model download, so
+timings measure our code, Chroma and SQLite rather than the transformer.
+"""
+import os, re, zlib
+from typing import List
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DIM = 384
+_TOKEN = re.compile(r"[A-Za-z0-9_.\-/]+")
+
+
+class HashEmbedder:
+    """Deterministic, L2-normalized hashing embedder."""
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+
+    def _vector(self, text: str):
+        import numpy as np
+        vec = np.zeros(self.dim, dtype=np.float32)
+        tokens = [t.lower() for t in _TOKEN.findall(text)]
+        for feat in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+            h = zlib.crc32(feat.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def encode(self, texts: List[str], **kwargs):
+        import numpy as np
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.stack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+
+def model_is_cached(model_name: str = MODEL_NAME) -> bool:
+    """True when the sentence-transformers model is already in the local HF cache."""
+    folder = "models--" + model_name.replace("/", "--")
+    hf_home = os.getenv("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface"))
+    candidates = [
+        os.getenv("HF_HUB_CACHE") or os.path.join(hf_home, "hub"),
+        os.getenv("SENTENCE_TRANSFORMERS_HOME", ""),
+    ]
+    return any(c and os.path.isdir(os.path.join(c, folder)) for c in candidates)
+
+
+def load_embedder(kind: str = "auto"):
+    """Return (embedder, label); kind is 'auto', 'real' or 'hash'."""
+    if kind == "hash" or (kind == "auto" and not model_is_cached()):
+        return HashEmbedder(), "hash"
+    # Never reach out to the hub from a benchmark run
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME), "minilm"
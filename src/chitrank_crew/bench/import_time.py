@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Import-time report for the console scripts.
+
+For every console script of this project, imports its module in a fresh
+interpreter under `-X importtime`, and summarizes the total import time and the
+heaviest top-level packages. Each script is checked against
+import_budget.json: a time budget, plus packages it must not import at startup
+(e.g. setup_rag must not pull in crewAI). Exits 1 on any violation.
+
+    uv run import_report            # report + check
+    uv run import_report --update   # re-baseline the time budgets on this machine
+"""
+import os, sys, json, argparse, subprocess
+from typing import Dict, List, Optional, Tuple
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), "import_budget.json")
+DIST_NAME = "chitrank_crew"
+
+
+def console_scripts() -> Dict[str, str]:
+    """Map script name -> module, from the installed distribution or pyproject.toml."""
+    try:
+        from importlib.metadata import distribution, PackageNotFoundError
+        try:
+            eps = distribution(DIST_NAME).entry_points
+            return {ep.name: ep.value.split(":")[0] for ep in eps if ep.group == "console_scripts"}
+        except PackageNotFoundError:
+            pass
+    except ImportError:
+        pass
+    try:
+        import tomllib  # Python 3.11+
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise SystemExit("import_report: install the project (uv sync) or `pip install tomli` "
+                             "to read pyproject.toml on Python 3.10")
+    pyproject = os.path.join(os.path.dirname(__file__), "..", "..", "..", "pyproject.toml")
+    with open(pyproject, "rb") as f:
+        scripts = tomllib.load(f)["project"]["scripts"]
+    return {name: target.split(":")[0] for name, target in scripts.items()}
+
+
+def measure(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import `module` in a fresh interpreter; return (total ms, self ms per top-level package)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    per_package: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        pkg = name.strip().split(".")[0]
+        per_package[pkg] = per_package.get(pkg, 0.0) + int(self_us) / 1000
+    return sum(per_package.values()), per_package
+
+
+def best_of(module: str, runs: int) -> Tuple[float, Dict[str, float]]:
+    results = [measure(module) for _ in range(runs)]
+    return min(results, key=lambda r: r[0])
+
+
+def run(argv: Optional[List[str]] = None):
+    """Print the import-time report and enforce the budgets."""
+    parser = argparse.ArgumentParser(prog="import_report", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3, help="Fresh-interpreter imports per module (best is kept)")
+    parser.add_argument("--top", type=int, default=6, help="Heaviest packages to list per script")
+    parser.add_argument("--update", action="store_true", help="Rewrite time budgets from this run")
+    parser.add_argument("--json", dest="json_out", default=None, help="Also write the report as JSON")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    with open(BUDGET_FILE, "r", encoding="utf-8") as f:
+        budget = json.load(f)
+    scripts = console_scripts()
+    modules = sorted(set(scripts.values()))
+    measured = {m: best_of(m, args.runs) for m in modules}
+
+    violations, report = [], {}
+    print(f"{'script':<18} {'module':<34} {'import ms':>10} {'budget':>8}  heaviest packages")
+    for name, module in sorted(scripts.items()):
+        total, per_package = measured[module]
+        rules = budget["modules"].get(module, {})
+        heaviest = sorted(per_package.items(), key=lambda kv: -kv[1])[:args.top]
+        report[name] = {"module": module, "import_ms": round(total, 1),
+                        "packages_ms": {k: round(v, 1) for k, v in heaviest}}
+        limit = rules.get("max_ms")
+        print(f"{name:<18} {module:<34} {total:>10.1f} {limit if limit else '-':>8}  "
+              + ", ".join(f"{k} {v:.0f}" for k, v in heaviest))
+        forbidden = sorted(p for p in rules.get("forbid", []) if p in per_package)
+        if forbidden:
+            violations.append(f"{name}: imports {', '.join(forbidden)} at startup")
+        if limit and total > limit and not args.update:
+            violations.append(f"{name}: {total:.1f} ms > budget {limit} ms")
+
+    if args.update:
+        for module in modules:
+            rules = budget["modules"].setdefault(module, {"forbid": []})
+            rules["max_ms"] = int(measured[module][0] * budget.get("headroom", 1.5)) + 1
+        with open(BUDGET_FILE, "w", encoding="utf-8") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"✓ Budgets updated in {BUDGET_FILE}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if violations:
+        print(f"❌ {len(violations)} import-time regression(s):")
+        for v in violations:
+            print(f"   - {v}")
+        sys.exit(1)
+    print("✓ All console scripts within import budget")
+    return report
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+"""
+Offline benchmark suite.
+
+Measures, against throwaway stores in a temp directory (never the real
+knowledge/ store):
+  - rag_ingest files/sec and chunks/sec per corpus size
+  - rag_query / vector_recall p50/p95/p99 latency versus corpus size, plus
+    rag_query per retrieval mode (auto/vector/lexical/hybrid)
+  - st_store / st_fetch throughput under concurrent writers/readers, and the
+    st_fetch(mode="summary") payload size versus raw rows
+  - MCP tool round-trip latency (in-memory client session)
+  - rag_query throughput with N concurrent "crews": sync tools on N threads
+    versus the tools' async `arun` on one event loop
+
+Results are written as JSON; pass --compare <baseline.json> to fail on regressions.
+
+    uv run benchmark --sizes 50,200 --queries 100 --out bench.json
+    uv run benchmark --compare bench.json
+"""
+import os, sys, json, time, shutil, tempfile, argparse, platform, threading
+from typing import Any, Callable, Dict, List, Optional
+
+from chitrank_crew import metrics
+from chitrank_crew.bench.corpus import generate_corpus, sample_queries
+from chitrank_crew.bench.embedder import load_embedder
+
+AGENTS = ("manager", "software_engineer", "devops_engineer", "qa_engineer")
+
+
+# ---------- Helpers ----------
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {"p50_ms": round(pick(0.50), 3), "p95_ms": round(pick(0.95), 3), "p99_ms": round(pick(0.99), 3),
+            "mean_ms": round(sum(ordered) / len(ordered), 3)}
+
+
+def timed_calls(fn: Callable[[Any], Any], args: List[Any]) -> List[float]:
+    out = []
+    for a in args:
+        start = time.perf_counter()
+        fn(a)
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+
+def isolate(module: Any, workdir: str, embedder: Any) -> None:
+    """Point memory_core's stores at `workdir` and inject the embedder."""
+    os.makedirs(workdir, exist_ok=True)
+    module.VEC_DIR = os.path.join(workdir, "vector_store")
+    module.ST_DB = os.path.join(workdir, "short_term.sqlite")
+    module.LEX_DB = os.path.join(workdir, "lexical_index.sqlite")
+    module.MEM_DIR = os.path.join(workdir, "memory")
+    module._chroma = None
+    module._collection = None
+    module._embedder = embedder
+
+
+def stage_breakdown() -> List[Dict[str, Any]]:
+    return [{k: v for k, v in s.items() if k != "agent"} for s in metrics.REGISTRY.summary()["stages"]]
+
+
+# ---------- Benchmarks ----------
+def bench_rag(workroot: str, embedder: Any, sizes: List[int], n_queries: int, seed: int) -> List[Dict[str, Any]]:
+    from chitrank_crew import memory_core
+    from chitrank_crew.tools import custom_tool as ct
+    results = []
+    queries = sample_queries(n_queries, seed)
+    for size in sizes:
+        workdir = os.path.join(workroot, f"rag_{size}")
+        docs = os.path.join(workdir, "docs")
+        generate_corpus(docs, size, seed=seed)
+        isolate(memory_core, workdir, embedder)
+        metrics.REGISTRY.reset()
+
+        start = time.perf_counter()
+        ingest = json.loads(ct.RAGIngestTool()._run(directory=docs, agent_scope="shared", namespace="bench"))
+        ingest_s = time.perf_counter() - start
+        ingest_stages = stage_breakdown()
+
+        remember = ct.VectorRememberTool()
+        notes = sample_queries(max(size, 20), seed + 7)
+        remember_ms = timed_calls(lambda i: remember._run(agent=AGENTS[i % len(AGENTS)], text=notes[i], tags=["bench"]),
+                                  list(range(len(notes))))
+
+        metrics.REGISTRY.reset()
+        rag, recall = ct.RAGQueryTool(), ct.VectorRecallTool()
+        rag_ms = timed_calls(lambda q: rag._run(query=q, top_k=5, agent_scope="shared", namespace="bench"), queries)
+        # Same queries per retrieval mode ("auto" routes identifiers to BM25)
+        rag_modes = {mode: percentiles(timed_calls(
+            lambda q: rag._run(query=q, top_k=5, agent_scope="shared", namespace="bench", mode=mode), queries))
+            for mode in memory_core.RAG_MODES}
+        idents = [q for q in queries if memory_core.is_identifier_query(q)] or queries
+        rag_identifier = {mode: percentiles(timed_calls(
+            lambda q: rag._run(query=q, top_k=5, agent_scope="shared", namespace="bench", mode=mode), idents))
+            for mode in ("vector", "auto")}
+        recall_ms = timed_calls(lambda i: recall._run(agent=AGENTS[i % len(AGENTS)], query=queries[i], top_k=5),
+                                list(range(len(queries))))
+        results.append({
+            "corpus_files": size,
+            "chunks": ingest.get("chunks_added", 0),
+            "ingest": {
+                "seconds": round(ingest_s, 3),
+                "files_per_s": round(ingest.get("files", 0) / ingest_s, 2) if ingest_s else 0.0,
+                "chunks_per_s": round(ingest.get("chunks_added", 0) / ingest_s, 2) if ingest_s else 0.0,
+                "stages": ingest_stages,
+            },
+            "vector_remember": percentiles(remember_ms),
+            "rag_query": percentiles(rag_ms),
+            "rag_query_modes": rag_modes,
+            "rag_query_identifiers": rag_identifier,
+            "vector_recall": percentiles(recall_ms),
+            "query_stages": stage_breakdown(),
+        })
+        print(f"   ✓ {size} files: {results[-1]['ingest']['chunks_per_s']} chunks/s, "
+              f"rag_query p95 {results[-1]['rag_query']['p95_ms']} ms ("
+              + ", ".join(f"{m} {v['p50_ms']}" for m, v in rag_modes.items()) + " ms p50)")
+    return results
+
+
+def bench_short_term(workroot: str, writers: List[int], ops: int) -> List[Dict[str, Any]]:
+    from chitrank_crew import memory_core
+    from chitrank_crew.tools import custom_tool as ct
+    results = []
+    for n in writers:
+        isolate(memory_core, os.path.join(workroot, f"st_{n}"), memory_core._embedder)
+        store, fetch = ct.STStoreTool(), ct.STFetchTool()
+
+        def run_threads(work: Callable[[int, int], None]) -> Dict[str, Any]:
+            barrier, lat, errors = threading.Barrier(n), [], []
+            lock = threading.Lock()
+
+            def worker(w: int):
+                local = []
+                barrier.wait()
+                for i in range(ops):
+                    start = time.perf_counter()
+                    try:
+                        work(w, i)
+                    except Exception as e:  # sqlite "database is locked" under contention
+                        errors.append(str(e))
+                    local.append((time.perf_counter() - start) * 1000)
+                with lock:
+                    lat.extend(local)
+
+            threads = [threading.Thread(target=worker, args=(w,)) for w in range(n)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            return {"ops_per_s": round(n * ops / elapsed, 1), "errors": len(errors), **percentiles(lat)}
+
+        store_res = run_threads(lambda w, i: store._run(session=f"bench-{w % 2}", agent=AGENTS[w % len(AGENTS)],
+                                                        role="note", content=f"note {w}/{i} " + "x" * 200))
+        fetch_res = run_threads(lambda w, i: fetch._run(session=f"bench-{w % 2}", limit=10))
+        summary_res = run_threads(lambda w, i: fetch._run(session=f"bench-{w % 2}", limit=10, mode="summary"))
+        # Prompt payload for a long session: raw rows versus summary + newest rows
+        payload = {"raw_limit_50_bytes": len(fetch._run(session="bench-0", limit=50)),
+                   "summary_bytes": len(fetch._run(session="bench-0", limit=50, mode="summary"))}
+        results.append({"threads": n, "ops_per_thread": ops, "st_store": store_res, "st_fetch": fetch_res,
+                        "st_fetch_summary": summary_res, "payload": payload})
+        print(f"   ✓ {n} threads: st_store {store_res['ops_per_s']} ops/s, st_fetch {fetch_res['ops_per_s']} ops/s, "
+              f"summary {summary_res['ops_per_s']} ops/s ({payload['summary_bytes']} vs "
+              f"{payload['raw_limit_50_bytes']} bytes raw)")
+    return results
+
+
+def bench_mcp(workdir: str, embedder: Any, n_calls: int, seed: int) -> Dict[str, Any]:
+    import anyio, logging
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from chitrank_crew import memory_core
+    from mcp_servers import crew_memory_server as server
+
+    # FastMCP logs every request at INFO
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+
+    isolate(memory_core, workdir, embedder)
+    queries = sample_queries(n_calls, seed)
+    calls = {
+        "st_store": lambda i: {"session": "bench-mcp", "agent": "manager", "role": "note", "content": queries[i]},
+        "st_fetch": lambda i: {"session": "bench-mcp", "limit": 10},
+        "vector_recall": lambda i: {"agent": AGENTS[i % len(AGENTS)], "query": queries[i], "top_k": 5},
+        "rag_query": lambda i: {"query": queries[i], "top_k": 5, "agent_scope": "shared", "namespace": "bench"},
+    }
+    results: Dict[str, Any] = {}
+
+    async def main():
+        async with create_connected_server_and_client_session(server.app) as client:
+            for name, make_args in calls.items():
+                await client.call_tool(name, make_args(0))  # warm-up
+                lat = []
+                for i in range(n_calls):
+                    start = time.perf_counter()
+                    await client.call_tool(name, make_args(i))
+                    lat.append((time.perf_counter() - start) * 1000)
+                results[name] = percentiles(lat)
+
+    anyio.run(main)
+    print("   ✓ " + ", ".join(f"{k} p50 {v['p50_ms']} ms" for k, v in results.items()))
+    return results
+
+
+def bench_concurrency(workdir: str, embedder: Any, crews: List[int], n_queries: int, seed: int) -> List[Dict[str, Any]]:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from chitrank_crew import memory_core
+    from chitrank_crew.tools.custom_tool import AgentScopedRAGQueryTool
+
+    isolate(memory_core, workdir, embedder)
+    queries = sample_queries(n_queries, seed)
+    tool = AgentScopedRAGQueryTool("shared")
+    tool._run(query=queries[0], namespace="bench")  # warm-up
+    results = []
+    for n in crews:
+        # Each "crew" issues its share of the queries back to back
+        shares = [queries[i::n] for i in range(n)]
+
+        def sync_crew(share):
+            for q in share:
+                tool._run(query=q, namespace="bench")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            list(pool.map(sync_crew, shares))
+        sync_s = time.perf_counter() - start
+
+        async def async_crews():
+            async def crew(share):
+                for q in share:
+                    await tool.arun(query=q, namespace="bench")
+            await asyncio.gather(*(crew(share) for share in shares))
+
+        start = time.perf_counter()
+        asyncio.run(async_crews())
+        async_s = time.perf_counter() - start
+        results.append({
+            "crews": n,
+            "sync_queries_per_s": round(n_queries / sync_s, 1),
+            "async_queries_per_s": round(n_queries / async_s, 1),
+        })
+        print(f"   ✓ {n} crews: sync {results[-1]['sync_queries_per_s']} q/s, "
+              f"async {results[-1]['async_queries_per_s']} q/s")
+    return results
+
+
+# ---------- Regression comparison ----------
+def flatten(obj: Any, prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k != "stages" and not k.endswith("_stages"):
+                out.update(flatten(v, f"{prefix}{k}."))
+    elif isinstance(obj, list):
+        for item in obj:
+            # Lists are keyed by the parameter being swept
+            key = next((f"{k}={item[k]}" for k in ("corpus_files", "threads", "crews") if isinstance(item, dict) and k in item), None)
+            if key:
+                out.update(flatten(item, f"{prefix}{key}."))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix.rstrip(".")] = float(obj)
+    return out
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return human-readable regressions beyond `threshold` (fractional)."""
+    cur, base = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    for key, old in sorted(base.items()):
+        new = cur.get(key)
+        if new is None or old <= 0:
+            continue
+        if key.endswith("_ms") and new > old * (1 + threshold):
+            regressions.append(f"{key}: {old:.3f} -> {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)")
+        elif key.endswith("_per_s") and new < old * (1 - threshold):
+            regressions.append(f"{key}: {old:.1f} -> {new:.1f} /s (-{(1 - new / old) * 100:.0f}%)")
+    return regressions
+
+
+def run(argv: Optional[List[str]] = None):
+    """Run the offline benchmark suite."""
+    parser = argparse.ArgumentParser(prog="benchmark", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="50,200", help="Comma-separated corpus sizes (files)")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per corpus size")
+    parser.add_argument("--writers", default="1,4,8", help="Comma-separated concurrent writer counts")
+    parser.add_argument("--ops", type=int, default=200, help="st_store/st_fetch operations per thread")
+    parser.add_argument("--crews", default="1,8", help="Comma-separated concurrent crew counts (empty to skip)")
+    parser.add_argument("--mcp-calls", type=int, default=50, help="Round trips per MCP tool (0 to skip)")
+    parser.add_argument("--embedder", choices=("auto", "real", "hash"), default="auto",
+                        help="'auto' uses MiniLM only if it is already cached")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Results JSON path (default: runs/bench-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression fraction")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    embedder, label = load_embedder(args.embedder)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    writers = [int(s) for s in args.writers.split(",") if s.strip()]
+    crews = [int(s) for s in args.crews.split(",") if s.strip()]
+    workroot = tempfile.mkdtemp(prefix="crew-bench-")
+    print(f"🏁 Benchmarking with embedder={label} in {workroot}")
+    try:
+        results: Dict[str, Any] = {}
+        print("📚 RAG ingest/query and vector memory...")
+        results["rag"] = bench_rag(workroot, embedder, sizes, args.queries, args.seed)
+        print("🗒️  Short-term store...")
+        results["short_term"] = bench_short_term(workroot, writers, args.ops)
+        if crews:
+            print("🧵 Concurrent crews (sync threads vs async tools)...")
+            results["concurrency"] = bench_concurrency(os.path.join(workroot, f"rag_{sizes[-1]}"), embedder,
+                                                       crews, args.queries, args.seed)
+        if args.mcp_calls > 0:
+            print("🔌 MCP round trips...")
+            results["mcp"] = bench_mcp(os.path.join(workroot, f"rag_{sizes[-1]}"), embedder, args.mcp_calls, args.seed)
+    finally:
+        shutil.rmtree(workroot, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "embedder": label,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(metrics.RUNS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("embedder") != label:
+            print(f"⚠️  Baseline used embedder={baseline.get('meta', {}).get('embedder')}, this run used {label}")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"   - {r}")
+            sys.exit(1)
+        print(f"✓ No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return report
+
+
+if __name__ == "__main__":
+    run()
@@ -1,19 +1,23 @@
 import os
+from functools import lru_cache
 from chitrank_crew.tools.custom_tool import VectorRememberTool, VectorRecallTool, STStoreTool, STFetchTool, RAGIngestTool, RAGQueryTool, AgentScopedRAGIngestTool, AgentScopedRAGQueryTool
+from chitrank_crew.metrics import bind_agent
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from typing import List
 from crewai import LLM
-from dotenv import load_dotenv
-load_dotenv()
-model = os.getenv("MODEL")
-base_url = os.getenv("API_BASE")
 
-ollama_llm = LLM(
-    model=model,
-    base_url=base_url
-)
+
+@lru_cache(maxsize=None)
+def ollama_llm() -> LLM:
+    """Build the crew LLM on first use (.env is only read then, not at import)."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return LLM(
+        model=os.getenv("MODEL"),
+        base_url=os.getenv("API_BASE")
+    )
 
 
 # RAG Ingest Directory for software_engineer
@@ -35,10 +39,10 @@ class ChitrankCrew():
         return Agent(
             config=self.agents_config['manager'],  # type: ignore[index]
             verbose=False,
-            llm=ollama_llm,
-            tools=[VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
+            llm=ollama_llm(),
+            tools=bind_agent([VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
             AgentScopedRAGIngestTool(default_agent_scope="manager"),
-            AgentScopedRAGQueryTool(default_agent_scope="manager"),]
+            AgentScopedRAGQueryTool(default_agent_scope="manager"),], "manager")
         )
 
     @agent
@@ -47,10 +51,10 @@ class ChitrankCrew():
         return Agent(
             config=self.agents_config['software_engineer'],  # type: ignore[index]
             verbose=False,
-            llm=ollama_llm,
-            tools=[VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
+            llm=ollama_llm(),
+            tools=bind_agent([VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
             AgentScopedRAGIngestTool(default_agent_scope="software_engineer"),
-            AgentScopedRAGQueryTool(default_agent_scope="software_engineer"),]
+            AgentScopedRAGQueryTool(default_agent_scope="software_engineer"),], "software_engineer")
         )
 
     @agent
@@ -59,10 +63,10 @@ class ChitrankCrew():
         return Agent(
             config=self.agents_config['devops_engineer'],  # type: ignore[index]
             verbose=False,
-            llm=ollama_llm,
-            tools=[VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
+            llm=ollama_llm(),
+            tools=bind_agent([VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
             AgentScopedRAGIngestTool(default_agent_scope="devops_engineer"),
-            AgentScopedRAGQueryTool(default_agent_scope="devops_engineer"),]
+            AgentScopedRAGQueryTool(default_agent_scope="devops_engineer"),], "devops_engineer")
         )
 
     @agent
@@ -71,10 +75,10 @@ class ChitrankCrew():
         return Agent(
             config=self.agents_config['qa_engineer'],  # type: ignore[index]
             verbose=False,
-            llm=ollama_llm,
-            tools=[VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
+            llm=ollama_llm(),
+            tools=bind_agent([VectorRememberTool(), VectorRecallTool(), STStoreTool(), STFetchTool(), RAGIngestTool(), RAGQueryTool(),
             AgentScopedRAGIngestTool(default_agent_scope="qa_engineer"),
-            AgentScopedRAGQueryTool(default_agent_scope="qa_engineer"),]
+            AgentScopedRAGQueryTool(default_agent_scope="qa_engineer"),], "qa_engineer")
         )
 
     @task
@@ -5,7 +5,7 @@ import warnings
 from datetime import datetime
 import uuid
 
-from chitrank_crew.crew import ChitrankCrew
+from chitrank_crew import metrics, trace
 
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
@@ -14,11 +14,14 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 # crew locally, so refrain from adding unnecessary logic into this file.
 # Replace with inputs you want to test with, it will automatically
 # interpolate any tasks and agents information
+#
+# The crew (crewAI, tools, LLM) is imported inside each entry point rather than
+# at module level so a console script only pays for what it actually uses.
 
 def prewarm_tools():
     """Pre-warm tools to load embedding model before crew execution"""
     try:
-        from chitrank_crew.tools.custom_tool import _ensure_vector_store
+        from chitrank_crew.memory_core import _ensure_vector_store
         _ensure_vector_store()
         print("✓ Tools pre-warmed (embedding model loaded)")
     except Exception as e:
@@ -27,6 +30,23 @@ def prewarm_tools():
 def new_session_id() -> str:
     return uuid.uuid4().hex
 
+def export_metrics(session: str):
+    """Write the tool latency metrics collected during this run (Prometheus text + JSON summary)"""
+    try:
+        paths = metrics.export(session)
+        print(f"✓ Tool metrics written to {paths['json']}")
+    except Exception as e:
+        print(f"⚠️  Could not export tool metrics: {e}")
+
+def kickoff_traced(inputs: dict):
+    """Kick off the crew; with CREW_TRACE=1 also write a Chrome trace of the run keyed by session"""
+    from chitrank_crew.crew import ChitrankCrew
+    with trace.run_trace(inputs["session"]) as run_trace:
+        result = ChitrankCrew().crew().kickoff(inputs=inputs)
+    if run_trace is not None:
+        print(f"✓ Run trace written to {run_trace.path}")
+    return result
+
 def run():
     """
     Run the crew.
@@ -48,9 +68,11 @@ def run():
     }
     
     try:
-        ChitrankCrew().crew().kickoff(inputs=inputs)
+        kickoff_traced(inputs)
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
+    finally:
+        export_metrics(inputs["session"])
 
 
 def train():
@@ -71,6 +93,7 @@ def train():
     }
 
     
+    from chitrank_crew.crew import ChitrankCrew
     try:
         ChitrankCrew().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
@@ -81,6 +104,7 @@ def replay():
     """
     Replay the crew execution from a specific task.
     """
+    from chitrank_crew.crew import ChitrankCrew
     try:
         ChitrankCrew().crew().replay(task_id=sys.argv[1])
 
@@ -104,6 +128,7 @@ def test():
         "docs_dir": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/shared",
     }   
     
+    from chitrank_crew.crew import ChitrankCrew
     try:
         ChitrankCrew().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
 
@@ -137,7 +162,9 @@ def run_with_trigger():
         "docs_dir": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/shared",
     }
     try:
-        result = ChitrankCrew().crew().kickoff(inputs=inputs)
+        result = kickoff_traced(inputs)
         return result
     except Exception as e:
         raise Exception(f"An error occurred while running the crew with trigger: {e}")
+    finally:
+        export_metrics(inputs["session"])
@@ -0,0 +1,819 @@
+"""
+Memory/RAG core shared by the crew tools, setup_rag and the MCP server.
+
+Plain functions over the long-term vector store (Chroma + MiniLM) and the
+short-term SQLite store, returning Python objects; the crewAI tools wrap them
+and serialize to JSON. Nothing heavy happens at import time: chromadb,
+sentence_transformers and pypdf are imported on first use, and the knowledge
+directories are only created when a store is first opened.
+
+The `a*` coroutine variants (used by the MCP server and the tools' `_arun`) run
+the blocking work on two sized thread pools, CPU (parse/encode) and IO
+(Chroma/SQLite), and micro-batch concurrent query encodes into a single
+embedder call.
+"""
+import os, re, json, time, glob, hashlib, sqlite3, threading, functools, contextvars, weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chitrank_crew.metrics import stage
+
+# ---------- Paths ----------
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+MEM_DIR = os.path.join(ROOT_DIR, "knowledge", "memory")
+VEC_DIR = os.path.join(ROOT_DIR, "knowledge", "vector_store")
+ST_DB = os.path.join(ROOT_DIR, "knowledge", "short_term.sqlite")
+LEX_DB = os.path.join(ROOT_DIR, "knowledge", "lexical_index.sqlite")
+DOCS_DIR = os.path.join(ROOT_DIR, "knowledge", "docs")
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+COLLECTION = "agent_long_term"
+
+# Async offload: CPU pool (PDF parse, encode) sized to the cores, IO pool
+# (Chroma, SQLite) wider since its threads mostly wait; plus the largest encode micro-batch
+CPU_WORKERS = int(os.getenv("CREW_CPU_WORKERS", str(os.cpu_count() or 2)))
+IO_WORKERS = int(os.getenv("CREW_IO_WORKERS", str(min(32, (os.cpu_count() or 2) * 4))))
+ENCODE_BATCH_MAX = int(os.getenv("CREW_ENCODE_BATCH_MAX", "32"))
+
+# Rolling short-term summaries: size cap of a session summary, and the default
+# st_fetch(mode="summary") budget (tokens estimated as chars / 4)
+SUMMARY_MAX_TOKENS = int(os.getenv("CREW_SUMMARY_MAX_TOKENS", "400"))
+FETCH_TOKEN_BUDGET = int(os.getenv("CREW_FETCH_TOKEN_BUDGET", "800"))
+SUMMARY_SHARE = 0.4  # of the fetch budget held back for summary lines, when there are any
+SUMMARY_EVERY = int(os.getenv("CREW_SUMMARY_EVERY", "32"))  # stores per session between background refreshes
+
+# ---------- Long-term Vector Memory (Chroma) ----------
+# Lazy imports to avoid import cost if unused
+_chroma = None
+_embedder = None
+_collection = None
+_init_lock = threading.Lock()
+
+def _open_collection():
+    # Caller holds _init_lock
+    global _chroma, _collection
+    if _chroma is None:
+        with stage("chroma.open"):
+            import chromadb
+            from chromadb.config import Settings
+            os.makedirs(MEM_DIR, exist_ok=True)
+            os.makedirs(VEC_DIR, exist_ok=True)
+            _chroma = chromadb.PersistentClient(path=VEC_DIR, settings=Settings(anonymized_telemetry=False))
+    if _collection is None:
+        _collection = _chroma.get_or_create_collection(name=COLLECTION)
+    return _collection
+
+def _ensure_collection():
+    """The Chroma collection alone, without loading the embedding model (snapshots, admin tasks)."""
+    if _collection is not None:
+        return _collection
+    with _init_lock:
+        return _open_collection()
+
+def _ensure_vector_store():
+    global _embedder
+    if _collection is not None and _embedder is not None:
+        return _collection, _embedder
+    with _init_lock:
+        _open_collection()
+        if _embedder is None:
+            with stage("embedder.load"):
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(EMBED_MODEL)
+    return _collection, _embedder
+
+def _parse_tags(meta: Dict[str, Any]) -> List[str]:
+    # ChromaDB metadata doesn't accept lists, so tags are stored as a JSON string
+    tags_str = meta.get("tags", "[]")
+    try:
+        return json.loads(tags_str) if isinstance(tags_str, str) else (tags_str or [])
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+def encode(texts: List[str]) -> List[List[float]]:
+    _, emb = _ensure_vector_store()
+    with stage("encode"):
+        return emb.encode(texts).tolist()
+
+def _remember_vector(agent: str, text: str, vec: List[float], tags: Optional[List[str]]) -> str:
+    col, _ = _ensure_vector_store()
+    doc_id = f"{agent}:{int(time.time()*1000)}"
+    meta = {"agent": agent, "tags": json.dumps(tags or [])}
+    with stage("chroma.add"):
+        col.add(ids=[doc_id], documents=[text], metadatas=[meta], embeddings=[vec])
+    return doc_id
+
+def vector_remember(agent: str, text: str, tags: Optional[List[str]] = None) -> str:
+    """Persist a note for `agent`; returns the document id."""
+    return _remember_vector(agent, text, encode([text])[0], tags)
+
+def _recall_by_vector(agent: str, qv: List[float], top_k: int) -> List[Dict[str, Any]]:
+    col, _ = _ensure_vector_store()
+    with stage("chroma.query"):
+        res = col.query(query_embeddings=[qv], n_results=top_k, where={"agent": agent})
+    docs = (res.get("documents") or [[]])[0]
+    metas = (res.get("metadatas") or [[]])[0]
+    scores = (res.get("distances") or [[]])[0]  # lower is better in Chroma 0.5 by default
+    return [{"text": d, "agent": m.get("agent"), "tags": _parse_tags(m), "score": float(s)}
+            for d, m, s in zip(docs, metas, scores)]
+
+def vector_recall(agent: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    return _recall_by_vector(agent, encode([query])[0], top_k)
+
+# ---------- Short-term Memory (SQLite) ----------
+_sqlite_ready: set = set()
+
+def _ensure_sqlite():
+    # Schema setup once per database file; it used to cost as much as the insert itself
+    if ST_DB in _sqlite_ready:
+        return sqlite3.connect(ST_DB)
+    os.makedirs(os.path.dirname(ST_DB), exist_ok=True)
+    conn = sqlite3.connect(ST_DB)
+    cur = conn.cursor()
+    cur.execute("""
+      CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session TEXT NOT NULL,
+        agent TEXT NOT NULL,
+        role TEXT NOT NULL,       -- 'user' | 'assistant' | 'system' | 'note'
+        content TEXT NOT NULL,
+        ts REAL NOT NULL
+      );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session, ts);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session, id);")
+    # Rolling per-session summary: one condensed line per folded message (JSON), up to through_id
+    cur.execute("""
+      CREATE TABLE IF NOT EXISTS session_summaries (
+        session TEXT PRIMARY KEY,
+        lines TEXT NOT NULL,          -- JSON [[message_id, line], ...], oldest first
+        omitted INTEGER NOT NULL,     -- older messages dropped to stay under SUMMARY_MAX_TOKENS
+        through_id INTEGER NOT NULL,  -- last messages.id folded in
+        updated REAL NOT NULL
+      );
+    """)
+    conn.commit()
+    _sqlite_ready.add(ST_DB)
+    return conn
+
+def st_store(session: str, agent: str, role: str, content: str) -> None:
+    with stage("sqlite.insert"):
+        conn = _ensure_sqlite()
+        try:
+            conn.execute("INSERT INTO messages(session, agent, role, content, ts) VALUES (?, ?, ?, ?, ?)",
+                         (session, agent, role, content, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+    _schedule_summary(session)
+
+def st_fetch(session: str, limit: int = 10, mode: str = "raw",
+             token_budget: Optional[int] = None) -> Any:
+    """Most recent messages for a session, newest first.
+
+    mode="summary" returns {"summary": [...], "recent": [...], ...} instead: the
+    newest raw rows (at most `limit`) plus the rolling summary lines of the
+    messages older than those rows, together within `token_budget`.
+    """
+    if mode == "summary":
+        token_budget = FETCH_TOKEN_BUDGET if token_budget is None else token_budget
+        if token_budget < 1:
+            raise ValueError("token_budget must be at least 1")
+        if limit < 1:
+            raise ValueError("limit must be at least 1 in summary mode")
+        return _fetch_with_summary(session, limit, token_budget)
+    if mode != "raw":
+        raise ValueError("mode must be 'raw' or 'summary'")
+    with stage("sqlite.select"):
+        conn = _ensure_sqlite()
+        try:
+            rows = conn.execute("SELECT agent, role, content, ts FROM messages WHERE session=? ORDER BY ts DESC LIMIT ?",
+                                (session, limit)).fetchall()
+        finally:
+            conn.close()
+    return [{"agent": a, "role": r, "content": c, "ts": t} for (a, r, c, t) in rows]
+
+# ---------- Rolling session summaries ----------
+# Extractive and incremental: each new message is folded in as one condensed
+# line (its first sentence, clipped) by a background refresh on the IO pool.
+# When the summary outgrows SUMMARY_MAX_TOKENS the oldest lines are clipped
+# harder, then dropped.
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+LINE_CHARS = 160
+OLD_LINE_CHARS = 60
+_summary_pending: set = set()
+_summary_backlog: Dict[str, int] = {}
+_summary_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _clip(text: str, n: int) -> str:
+    if len(text) <= n:
+        return text
+    return text[:n - 1].rstrip() + "…" if n > 1 else "…"[:max(n, 0)]
+
+def _condense(agent: str, role: str, content: str) -> str:
+    first = _SENTENCE.split(" ".join(content.split()), 1)[0]
+    return f"{agent}/{role}: {_clip(first, LINE_CHARS)}"
+
+def _shrink(lines: List[list], omitted: int) -> int:
+    """Clip the oldest lines, then drop them, until the summary fits; returns the new omitted count."""
+    total = sum(estimate_tokens(line) for _, line in lines)
+    for entry in lines:
+        if total <= SUMMARY_MAX_TOKENS:
+            return omitted
+        if len(entry[1]) > OLD_LINE_CHARS:
+            total -= estimate_tokens(entry[1])
+            entry[1] = _clip(entry[1], OLD_LINE_CHARS)
+            total += estimate_tokens(entry[1])
+    while lines and total > SUMMARY_MAX_TOKENS:
+        total -= estimate_tokens(lines.pop(0)[1])
+        omitted += 1
+    return omitted
+
+def refresh_summary(session: str) -> int:
+    """Fold messages newer than the summary into it; returns how many were folded."""
+    with stage("summary.update"):
+        conn = _ensure_sqlite()
+        try:
+            # IMMEDIATE takes the write lock up front: concurrent refreshers (threads or
+            # processes) serialize instead of folding the same rows twice
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT lines, omitted, through_id FROM session_summaries WHERE session=?",
+                               (session,)).fetchone()
+            lines, omitted, through_id = (json.loads(row[0]), row[1], row[2]) if row else ([], 0, 0)
+            new = conn.execute("SELECT id, agent, role, content FROM messages WHERE session=? AND id>? ORDER BY id",
+                               (session, through_id)).fetchall()
+            if not new:
+                conn.rollback()
+                return 0
+            lines.extend([i, _condense(a, r, c)] for i, a, r, c in new)
+            omitted = _shrink(lines, omitted)
+            conn.execute("INSERT OR REPLACE INTO session_summaries VALUES (?, ?, ?, ?, ?)",
+                         (session, json.dumps(lines), omitted, new[-1][0], time.time()))
+            conn.commit()
+            return len(new)
+        finally:
+            conn.close()
+
+def _summary_job(session: str) -> None:
+    with _summary_lock:
+        _summary_pending.discard(session)
+    try:
+        refresh_summary(session)
+    except Exception:
+        pass  # best effort: the next store or fetch catches up
+
+def _request_refresh(session: str) -> None:
+    # Coalesced per session: a queued refresh folds every row stored before it runs
+    with _summary_lock:
+        if session in _summary_pending:
+            return
+        _summary_pending.add(session)
+        _summary_backlog.pop(session, None)
+    ctx = contextvars.copy_context()
+    _get_executor("io").submit(ctx.run, _summary_job, session)
+
+def _schedule_summary(session: str) -> None:
+    # Refresh every SUMMARY_EVERY stores; summary fetches condense the few rows in
+    # between on the fly
+    with _summary_lock:
+        backlog = _summary_backlog.get(session, 0) + 1
+        if backlog < SUMMARY_EVERY:
+            _summary_backlog[session] = backlog
+            return
+    _request_refresh(session)
+
+def _fetch_with_summary(session: str, limit: int, token_budget: int) -> Dict[str, Any]:
+    with stage("sqlite.select"):
+        conn = _ensure_sqlite()
+        try:
+            rows = conn.execute("SELECT id, agent, role, content, ts FROM messages WHERE session=? "
+                                "ORDER BY id DESC LIMIT ?", (session, limit)).fetchall()
+            srow = conn.execute("SELECT lines, omitted, through_id FROM session_summaries WHERE session=?",
+                                (session,)).fetchone()
+            lines, omitted, through_id = (json.loads(srow[0]), srow[1], srow[2]) if srow else ([], 0, 0)
+            # Raw rows get the budget minus a share held back for the summary (if one exists)
+            has_history = bool(lines) or conn.execute(
+                "SELECT 1 FROM messages WHERE session=? AND id<? LIMIT 1",
+                (session, rows[-1][0] if rows else 0)).fetchone() is not None
+            raw_budget = token_budget - (int(token_budget * SUMMARY_SHARE) if has_history else 0)
+            oldest_kept = None
+            recent, used = [], 0
+            for i, a, r, c, t in rows:
+                cost = estimate_tokens(c)
+                if recent and used + cost > raw_budget:
+                    break
+                if not recent and cost > raw_budget:
+                    c, cost = _clip(c, raw_budget * 4), raw_budget  # the newest row always comes back
+                recent.append({"agent": a, "role": r, "content": c, "ts": t})
+                used += cost
+                oldest_kept = i
+            unfolded = sum(1 for row in rows[:len(recent)] if row[0] > through_id)
+            # Rows the background refresh hasn't folded yet are condensed on the fly
+            if oldest_kept is not None and through_id < oldest_kept:
+                pending = [[i, _condense(a, r, c)] for i, a, r, c in conn.execute(
+                    "SELECT id, agent, role, content FROM messages WHERE session=? AND id>? AND id<? ORDER BY id",
+                    (session, through_id, oldest_kept))]
+                lines.extend(pending)
+                unfolded += len(pending)
+        finally:
+            conn.close()
+    if unfolded > SUMMARY_EVERY:
+        # Other processes' stores, or a refresh that failed: don't re-condense a growing backlog
+        _request_refresh(session)
+    # Summary lines cover what the raw rows don't; newest first until the budget runs
+    # out, so the summary never skips over a stretch of the timeline
+    summary: List[str] = []
+    older = [line for i, line in lines if oldest_kept is None or i < oldest_kept]
+    for line in reversed(older):
+        if used + estimate_tokens(line) > token_budget:
+            break
+        summary.append(line)
+        used += estimate_tokens(line)
+    omitted += len(older) - len(summary)
+    summary.reverse()
+    return {"session": session, "summary": summary, "omitted": omitted, "recent": recent, "tokens": used}
+
+# ---------- RAG: Ingest PDFs and TXT into Chroma, and query ----------
+def _read_pdf(path: str) -> str:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            continue
+    return "\n".join(texts)
+
+def _read_txt(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+def _chunk_text(text: str, max_words: int = 300, overlap_words: int = 50):
+    words = re.findall(r"\S+", text)
+    chunks = []
+    i = 0
+    while i < len(words):
+        chunk = words[i:i+max_words]
+        chunks.append(" ".join(chunk))
+        if i + max_words >= len(words):
+            break
+        i += max_words - overlap_words
+    return chunks
+
+def collect_files(directory: str, patterns: str = "*.pdf,*.txt") -> List[str]:
+    pats = [p.strip() for p in patterns.split(",") if p.strip()]
+    files = []
+    for p in pats:
+        files.extend(glob.glob(os.path.join(directory, p), recursive=True))
+    return files
+
+def load_chunks(path: str, max_words: int = 300, overlap_words: int = 50) -> List[str]:
+    """Read and chunk one PDF/TXT file ([] for other types or empty files)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        with stage("pdf.parse"):
+            text = _read_pdf(path)
+    elif ext == ".txt":
+        with stage("txt.read"):
+            text = _read_txt(path)
+    else:
+        return []
+    if not text.strip():
+        return []
+    with stage("chunk"):
+        return _chunk_text(text, max_words=max_words, overlap_words=overlap_words)
+
+def source_key(path: str) -> str:
+    """The `path` stored with a file's chunks: relative to DOCS_DIR when inside it, so
+    stores and snapshots stay valid when the project moves; absolute otherwise."""
+    path = os.path.abspath(path)
+    rel = os.path.relpath(path, DOCS_DIR)
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep) or os.path.isabs(rel):
+        return path
+    return rel.replace(os.sep, "/")
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _file_keys(path: str) -> List[str]:
+    # Stores written before paths were made relative hold the absolute path
+    return list(dict.fromkeys([source_key(path), os.path.abspath(path)]))
+
+def _keys_where(keys: List[str], agent_scope: str, namespace: str) -> Dict[str, Any]:
+    return {"$and": [{"path": {"$in": keys}}, {"agent_scope": agent_scope}, {"namespace": namespace}]}
+
+def chunk_ids(key: str, digest: str, agent_scope: str, namespace: str, n: int) -> List[str]:
+    # Deterministic, so re-adding the same file content (snapshot import) upserts in place
+    return [f"{agent_scope}/{namespace}:{key}:{digest[:16]}:{i}" for i in range(n)]
+
+def _store_chunks(path: str, chunks: List[str], embeds: List[List[float]],
+                  agent_scope: str, namespace: str, digest: Optional[str] = None) -> int:
+    col, _ = _ensure_vector_store()
+    key, digest = source_key(path), digest or file_digest(path)
+    ids = chunk_ids(key, digest, agent_scope, namespace, len(chunks))
+    metas = [{"path": key, "sha256": digest, "agent_scope": agent_scope, "namespace": namespace, "chunk": i}
+             for i in range(len(chunks))]
+    with stage("chroma.add"):
+        col.upsert(ids=ids, documents=chunks, metadatas=metas, embeddings=embeds)
+    lexical_add(ids, chunks, metas)
+    return len(chunks)
+
+def ingest_file(path: str, agent_scope: str = "shared", namespace: str = "default",
+                max_words: int = 300, overlap_words: int = 50, digest: Optional[str] = None) -> int:
+    """Parse, chunk, embed and store one file; returns the number of chunks added."""
+    chunks = load_chunks(path, max_words=max_words, overlap_words=overlap_words)
+    if not chunks:
+        return 0
+    return _store_chunks(path, chunks, encode(chunks), agent_scope, namespace, digest)
+
+def stored_file(path: str, agent_scope: str, namespace: str) -> Tuple[Optional[str], int]:
+    """(sha256, chunk count) of what the store holds for `path` under this scope/namespace."""
+    col = _ensure_collection()
+    with stage("chroma.get"):
+        metas = col.get(where=_keys_where(_file_keys(path), agent_scope, namespace), include=["metadatas"])["metadatas"]
+    digests = {(m or {}).get("sha256") for m in metas}
+    return (digests.pop() if len(digests) == 1 else None), len(metas)
+
+def delete_source_chunks(keys: List[str], agent_scope: str, namespace: str) -> None:
+    """Drop the chunks stored under any of these `path` keys in this scope/namespace."""
+    col = _ensure_collection()
+    with stage("chroma.delete"):
+        col.delete(where=_keys_where(keys, agent_scope, namespace))
+    lexical_delete(keys, agent_scope, namespace)
+
+def delete_file_chunks(path: str, agent_scope: str, namespace: str) -> None:
+    """Drop the chunks a previous ingest of `path` added under this scope/namespace."""
+    delete_source_chunks(_file_keys(path), agent_scope, namespace)
+
+def rag_ingest(directory: str, agent_scope: str = "shared", namespace: str = "default",
+               patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50) -> Dict[str, int]:
+    files = collect_files(directory, patterns)
+    added = 0
+    for path in files:
+        try:
+            added += ingest_file(path, agent_scope=agent_scope, namespace=namespace,
+                                 max_words=max_words, overlap_words=overlap_words)
+        except Exception:
+            continue
+    return {"files": len(set(files)), "chunks_added": added}
+
+def build_where(agent_scope: Optional[str] = None, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    # ChromaDB requires $and operator for multiple conditions
+    conditions = []
+    if agent_scope:
+        conditions.append({"agent_scope": agent_scope})
+    if namespace:
+        conditions.append({"namespace": namespace})
+    if len(conditions) == 1:
+        return conditions[0]
+    if len(conditions) > 1:
+        return {"$and": conditions}
+    return None
+
+def _vector_hits(qv: List[float], top_k: int, agent_scope: Optional[str],
+                 namespace: Optional[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    col, _ = _ensure_vector_store()
+    with stage("chroma.query"):
+        res = col.query(query_embeddings=[qv], n_results=top_k, where=build_where(agent_scope, namespace))
+    ids = (res.get("ids") or [[]])[0]
+    docs = (res.get("documents") or [[]])[0]
+    metas = (res.get("metadatas") or [[]])[0]
+    scores = (res.get("distances") or [[]])[0]
+    return [(i, {
+        "text": d,
+        "path": m.get("path"),
+        "agent_scope": m.get("agent_scope"),
+        "namespace": m.get("namespace"),
+        "score": float(s),
+        "retrieval": "vector",
+    }) for i, d, m, s in zip(ids, docs, metas, scores)]
+
+def _rag_query_by_vector(qv: List[float], top_k: int, agent_scope: Optional[str],
+                         namespace: Optional[str]) -> List[Dict[str, Any]]:
+    return [hit for _, hit in _vector_hits(qv, top_k, agent_scope, namespace)]
+
+# ---------- Lexical index (SQLite FTS5 BM25) over the same RAG chunks ----------
+# Chunks are mirrored into an FTS5 index keyed by the Chroma ids. The tokenizer
+# keeps '_' inside tokens, so config keys like MAX_LOGIN_ATTEMPTS stay one term.
+# Dotted/hyphenated names (auth-service.yaml) are matched as phrases.
+_IDENT = re.compile(r"\w+(?:[./\-]\w+)+|\w*_\w+|(?=\w*\d)(?=\w*[A-Za-z])\w+|[a-z]+[A-Z]\w*|[A-Z]{3,}")
+_LEX_TERM = re.compile(r"\w+(?:[./\-]\w+)*")
+RRF_K = 60
+RAG_MODES = ("auto", "vector", "lexical", "hybrid")
+
+_lexical_local = threading.local()
+
+def _ensure_lexical() -> sqlite3.Connection:
+    # One long-lived connection per thread: opening one (schema + FTS5 setup)
+    # costs several times more than the BM25 query itself
+    conns = getattr(_lexical_local, "conns", None)
+    if conns is None:
+        conns = _lexical_local.conns = {}
+    conn = conns.get(LEX_DB)
+    if conn is not None:
+        return conn
+    os.makedirs(os.path.dirname(LEX_DB), exist_ok=True)
+    conn = sqlite3.connect(LEX_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.executescript("""
+      CREATE TABLE IF NOT EXISTS rag_chunks (
+        rowid INTEGER PRIMARY KEY,
+        chunk_id TEXT NOT NULL UNIQUE,
+        path TEXT,
+        agent_scope TEXT,
+        namespace TEXT,
+        text TEXT NOT NULL
+      );
+      CREATE INDEX IF NOT EXISTS idx_rag_chunks_source ON rag_chunks(path, agent_scope, namespace);
+      CREATE VIRTUAL TABLE IF NOT EXISTS rag_fts USING fts5(
+        text, content='rag_chunks', content_rowid='rowid', tokenize="unicode61 tokenchars '_'"
+      );
+      CREATE TRIGGER IF NOT EXISTS rag_chunks_ai AFTER INSERT ON rag_chunks BEGIN
+        INSERT INTO rag_fts(rowid, text) VALUES (new.rowid, new.text);
+      END;
+      CREATE TRIGGER IF NOT EXISTS rag_chunks_ad AFTER DELETE ON rag_chunks BEGIN
+        INSERT INTO rag_fts(rag_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+      END;
+    """)
+    conns[LEX_DB] = conn
+    return conn
+
+def lexical_add(ids: List[str], chunks: List[str], metas: List[Dict[str, Any]]) -> None:
+    """Index chunks for BM25 search (replacing any with the same ids)."""
+    with stage("fts.insert"):
+        with _ensure_lexical() as conn:
+            conn.executemany("DELETE FROM rag_chunks WHERE chunk_id=?", [(i,) for i in ids])
+            conn.executemany(
+                "INSERT INTO rag_chunks(chunk_id, path, agent_scope, namespace, text) VALUES (?, ?, ?, ?, ?)",
+                [(i, m.get("path"), m.get("agent_scope"), m.get("namespace"), c) for i, c, m in zip(ids, chunks, metas)])
+
+def lexical_delete(keys: List[str], agent_scope: str, namespace: str) -> None:
+    with _ensure_lexical() as conn:
+        conn.executemany("DELETE FROM rag_chunks WHERE path=? AND agent_scope=? AND namespace=?",
+                         [(key, agent_scope, namespace) for key in keys])
+
+def lexical_reset(agent_scope: Optional[str] = None, namespace: Optional[str] = None) -> None:
+    """Empty the index, or just one scope/namespace pair of it."""
+    with _ensure_lexical() as conn:
+        if agent_scope is None:
+            conn.execute("DELETE FROM rag_chunks")
+        else:
+            conn.execute("DELETE FROM rag_chunks WHERE agent_scope=? AND namespace=?", (agent_scope, namespace))
+
+def lexical_count() -> int:
+    return _ensure_lexical().execute("SELECT COUNT(*) FROM rag_chunks").fetchone()[0]
+
+def rebuild_lexical_index(batch: int = 2000) -> int:
+    """Re-index every RAG chunk in the Chroma collection (stores ingested before the index existed)."""
+    col = _ensure_collection()
+    lexical_reset()
+    indexed = 0
+    for offset in range(0, col.count(), batch):
+        page = col.get(limit=batch, offset=offset, include=["documents", "metadatas"])
+        rows = [(i, d, m) for i, d, m in zip(page["ids"], page["documents"], page["metadatas"])
+                if m and m.get("path")]  # skip vector_remember notes
+        if rows:
+            lexical_add([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+            indexed += len(rows)
+    return indexed
+
+def _identifier_terms(query: str) -> List[str]:
+    return [w for w in (w.strip("\"'`,;:()?") for w in query.split()) if _IDENT.fullmatch(w)]
+
+def is_identifier_query(query: str) -> bool:
+    """Short queries made only of config keys, error codes, file names or code identifiers."""
+    words = query.split()
+    return 0 < len(words) <= 3 and len(_identifier_terms(query)) == len(words)
+
+def _fts_query(query: str) -> str:
+    # Match on the identifiers when there are any: OR-ing in common words ("token",
+    # "reset") would match nearly every chunk. Every term becomes a quoted phrase
+    # (no FTS5 syntax injection), OR-ed for BM25 ranking
+    terms = _LEX_TERM.findall(" ".join(_identifier_terms(query)) or query)
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+def _lexical_hits(query: str, top_k: int, agent_scope: Optional[str],
+                  namespace: Optional[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    match = _fts_query(query)
+    if not match:
+        return []
+    sql = ("SELECT c.chunk_id, c.text, c.path, c.agent_scope, c.namespace, bm25(rag_fts) AS score "
+           "FROM rag_fts JOIN rag_chunks c ON c.rowid = rag_fts.rowid WHERE rag_fts MATCH ?")
+    params: List[Any] = [match]
+    if agent_scope:
+        sql += " AND c.agent_scope = ?"
+        params.append(agent_scope)
+    if namespace:
+        sql += " AND c.namespace = ?"
+        params.append(namespace)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(top_k)
+    with stage("fts.query"):
+        rows = _ensure_lexical().execute(sql, params).fetchall()
+    # bm25() is negative, lower is better (like Chroma distances)
+    return [(i, {"text": t, "path": p, "agent_scope": a, "namespace": n, "score": float(sc), "retrieval": "lexical"})
+            for i, t, p, a, n, sc in rows]
+
+def fuse_rrf(rankings: List[List[Tuple[str, Dict[str, Any]]]], top_k: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion; `score` becomes the fused RRF score (higher is better)."""
+    fused: Dict[str, float] = {}
+    hits: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, (chunk_id, hit) in enumerate(ranking):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+            hits.setdefault(chunk_id, hit)
+    best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**hits[i], "score": round(fused[i], 6), "retrieval": "hybrid"} for i in best]
+
+def _candidates(top_k: int) -> int:
+    return max(top_k * 4, 20)
+
+def _resolve_mode(query: str, mode: str) -> str:
+    if mode not in RAG_MODES:
+        raise ValueError(f"mode must be one of {', '.join(RAG_MODES)}")
+    if mode == "auto":
+        # Exact terms only help when the query has some; plain prose stays on the ANN path
+        if is_identifier_query(query):
+            return "lexical"
+        return "hybrid" if _identifier_terms(query) else "vector"
+    return mode
+
+def rag_query(query: str, top_k: int = 5, agent_scope: Optional[str] = None,
+              namespace: Optional[str] = None, mode: str = "auto") -> List[Dict[str, Any]]:
+    """Search the RAG chunks.
+
+    mode: 'vector' (MiniLM ANN), 'lexical' (BM25, no embedder), 'hybrid' (both,
+    RRF-fused) or 'auto': lexical for short identifier-like queries (falling
+    back to hybrid when nothing matches), hybrid for prose that mentions an
+    identifier, vector otherwise.
+    """
+    resolved = _resolve_mode(query, mode)
+    if resolved == "lexical":
+        with stage("rag.lexical"):
+            hits = _lexical_hits(query, top_k, agent_scope, namespace)
+        if hits or mode == "lexical":
+            return [hit for _, hit in hits]
+        resolved = "hybrid"
+    if resolved == "vector":
+        with stage("rag.vector"):
+            return _rag_query_by_vector(encode([query])[0], top_k, agent_scope, namespace)
+    with stage("rag.hybrid"):
+        n = _candidates(top_k)
+        lexical = _lexical_hits(query, n, agent_scope, namespace)
+        vector = _vector_hits(encode([query])[0], n, agent_scope, namespace)
+        return fuse_rrf([vector, lexical], top_k)
+
+# ---------- Async variants (CPU/IO executors + encode micro-batching) ----------
+# asyncio and concurrent.futures are imported lazily: the sync callers (setup_rag,
+# crew tools) shouldn't pay for them at startup.
+_executors: Dict[str, Any] = {}
+
+def _get_executor(kind: str):
+    pool = _executors.get(kind)
+    if pool is None:
+        with _init_lock:
+            pool = _executors.get(kind)
+            if pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                workers = CPU_WORKERS if kind == "cpu" else IO_WORKERS
+                pool = _executors[kind] = ThreadPoolExecutor(max_workers=workers,
+                                                             thread_name_prefix=f"memory-{kind}")
+    return pool
+
+async def _offload(kind: str, fn: Callable, *args, **kwargs):
+    import asyncio
+    # Copy the context so metrics agent/tool labels follow the work onto the pool
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(kind), call)
+
+async def offload_cpu(fn: Callable, *args, **kwargs):
+    """Run CPU-bound `fn` (PDF parse, encode) on the CPU pool."""
+    return await _offload("cpu", fn, *args, **kwargs)
+
+async def offload_io(fn: Callable, *args, **kwargs):
+    """Run blocking `fn` (Chroma, SQLite) on the IO pool."""
+    return await _offload("io", fn, *args, **kwargs)
+
+class EncodeBatcher:
+    """Coalesces concurrent single-text encode requests into one embedder call.
+
+    An idle batcher encodes a request straight away; requests arriving while an
+    encode is running queue up and go out together as the next batch (at most
+    ENCODE_BATCH_MAX texts). Light load adds no latency, heavy load amortizes
+    the model call.
+    """
+
+    def __init__(self, max_batch: int = ENCODE_BATCH_MAX):
+        self.max_batch = max_batch
+        self._pending: List[tuple] = []
+        self._running = False
+
+    async def encode(self, text: str) -> List[float]:
+        import asyncio
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((text, fut))
+        if not self._running:
+            self._running = True
+            asyncio.ensure_future(self._drain())
+        return await fut
+
+    async def _drain(self):
+        try:
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                try:
+                    vectors = await offload_cpu(encode, [text for text, _ in batch])
+                except Exception as e:
+                    for _, fut in batch:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                for (_, fut), vec in zip(batch, vectors):
+                    if not fut.done():
+                        fut.set_result(vec)
+        finally:
+            self._running = False
+
+# One batcher per event loop (futures and timers are loop-bound)
+_batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, EncodeBatcher]" = weakref.WeakKeyDictionary()
+
+async def aencode_query(text: str) -> List[float]:
+    import asyncio
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = EncodeBatcher()
+    return await batcher.encode(text)
+
+async def avector_remember(agent: str, text: str, tags: Optional[List[str]] = None) -> str:
+    vec = await aencode_query(text)
+    return await offload_io(_remember_vector, agent, text, vec, tags)
+
+async def avector_recall(agent: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    qv = await aencode_query(query)
+    return await offload_io(_recall_by_vector, agent, qv, top_k)
+
+async def ast_store(session: str, agent: str, role: str, content: str) -> None:
+    await offload_io(st_store, session, agent, role, content)
+
+async def ast_fetch(session: str, limit: int = 10, mode: str = "raw", token_budget: Optional[int] = None) -> Any:
+    return await offload_io(st_fetch, session, limit, mode, token_budget)
+
+async def arag_ingest(directory: str, agent_scope: str = "shared", namespace: str = "default",
+                      patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50) -> Dict[str, int]:
+    """Ingest files concurrently: parse+encode on the CPU pool, Chroma writes on the IO pool."""
+    import asyncio
+    files = await offload_io(collect_files, directory, patterns)
+    slots = asyncio.Semaphore(CPU_WORKERS)
+
+    async def one(path: str) -> int:
+        async with slots:
+            try:
+                chunks = await offload_cpu(load_chunks, path, max_words, overlap_words)
+                if not chunks:
+                    return 0
+                embeds = await offload_cpu(encode, chunks)
+            except Exception:
+                return 0
+        try:
+            return await offload_io(_store_chunks, path, chunks, embeds, agent_scope, namespace)
+        except Exception:
+            return 0
+
+    added = await asyncio.gather(*(one(p) for p in files))
+    return {"files": len(set(files)), "chunks_added": sum(added)}
+
+async def arag_query(query: str, top_k: int = 5, agent_scope: Optional[str] = None,
+                     namespace: Optional[str] = None, mode: str = "auto") -> List[Dict[str, Any]]:
+    import asyncio
+    resolved = _resolve_mode(query, mode)
+    if resolved == "lexical":
+        with stage("rag.lexical"):
+            hits = await offload_io(_lexical_hits, query, top_k, agent_scope, namespace)
+        if hits or mode == "lexical":
+            return [hit for _, hit in hits]
+        resolved = "hybrid"
+    if resolved == "vector":
+        with stage("rag.vector"):
+            qv = await aencode_query(query)
+            return await offload_io(_rag_query_by_vector, qv, top_k, agent_scope, namespace)
+    with stage("rag.hybrid"):
+        n = _candidates(top_k)
+
+        async def vector_hits():
+            qv = await aencode_query(query)
+            return await offload_io(_vector_hits, qv, n, agent_scope, namespace)
+
+        # BM25 runs on the IO pool while the query is being encoded; gather retrieves
+        # the other side's outcome even when one of them raises
+        vector, lexical = await asyncio.gather(vector_hits(),
+                                               offload_io(_lexical_hits, query, n, agent_scope, namespace))
+        return fuse_rrf([vector, lexical], top_k)
@@ -0,0 +1,355 @@
+"""
+Tool-level latency metrics and profiling hooks.
+
+Every crew tool `_run` (and every MCP tool) is wrapped so we record, per tool and
+per agent, a latency histogram, call/error counts and payload sizes in and out.
+Internal stages (encode, chroma query, SQL, PDF parse, chunking) are timed with
+the `stage()` context manager and attributed to the agent of the enclosing tool
+call. At the end of a run `export()` writes a Prometheus text file and a JSON
+summary; set CREW_PROFILE_TOOL=rag_query (comma-separated) to also capture a
+cProfile dump for the chosen tools. Tool and stage timings are also forwarded
+as spans to `chitrank_crew.trace` when a run trace is being recorded.
+
+This module is stdlib-only so it is cheap to import from anywhere.
+"""
+import os, json, time, inspect, threading, functools, contextvars
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from chitrank_crew.trace import record_span
+
+# ---------- Paths ----------
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+RUNS_DIR = os.getenv("CREW_RUNS_DIR", os.path.join(ROOT_DIR, "runs"))
+
+# Prometheus-style cumulative buckets (seconds / bytes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Raw samples kept per series for the p50/p95/p99 estimates in the JSON summary
+MAX_SAMPLES = 2048
+
+# Agent of the tool call currently executing (stages inherit it)
+_current_agent: contextvars.ContextVar = contextvars.ContextVar("crew_metrics_agent", default=None)
+# Name of the outermost tool call, so super()._run() from scoped tools isn't counted twice
+_current_tool: contextvars.ContextVar = contextvars.ContextVar("crew_metrics_tool", default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram plus a bounded window of raw samples for quantiles."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "samples")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.samples: deque = deque(maxlen=MAX_SAMPLES)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[idx]
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        running = 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            yield _fmt_num(bound), running
+        yield "+Inf", running + self.counts[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe in-process store for tool and stage metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.tool_latency: Dict[Tuple[str, str], Histogram] = {}
+            self.tool_bytes_in: Dict[Tuple[str, str], Histogram] = {}
+            self.tool_bytes_out: Dict[Tuple[str, str], Histogram] = {}
+            self.tool_calls: Dict[Tuple[str, str, str], int] = {}
+            self.stage_latency: Dict[Tuple[str, str], Histogram] = {}
+            self.started = time.time()
+
+    def record_tool(self, tool: str, agent: str, seconds: float, bytes_in: int, bytes_out: int, ok: bool) -> None:
+        key = (tool, agent)
+        with self._lock:
+            self.tool_latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.tool_bytes_in.setdefault(key, Histogram(SIZE_BUCKETS)).observe(bytes_in)
+            self.tool_bytes_out.setdefault(key, Histogram(SIZE_BUCKETS)).observe(bytes_out)
+            ckey = (tool, agent, "ok" if ok else "error")
+            self.tool_calls[ckey] = self.tool_calls.get(ckey, 0) + 1
+
+    def record_stage(self, stage: str, agent: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_latency.setdefault((stage, agent), Histogram(LATENCY_BUCKETS)).observe(seconds)
+
+    # ---------- Exporters ----------
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines += _prom_histogram("crew_tool_latency_seconds", "Tool _run wall-clock latency",
+                                     ("tool", "agent"), self.tool_latency)
+            lines += _prom_histogram("crew_tool_request_bytes", "Serialized tool arguments size",
+                                     ("tool", "agent"), self.tool_bytes_in)
+            lines += _prom_histogram("crew_tool_response_bytes", "Serialized tool result size",
+                                     ("tool", "agent"), self.tool_bytes_out)
+            lines += _prom_histogram("crew_stage_latency_seconds", "Internal stage latency (encode, query, sql, ...)",
+                                     ("stage", "agent"), self.stage_latency)
+            lines.append("# HELP crew_tool_calls_total Tool calls by outcome")
+            lines.append("# TYPE crew_tool_calls_total counter")
+            for (tool, agent, status), n in sorted(self.tool_calls.items()):
+                lines.append(f"crew_tool_calls_total{_labels(tool=tool, agent=agent, status=status)} {n}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            tools = []
+            for (tool, agent), h in sorted(self.tool_latency.items()):
+                tools.append({
+                    "tool": tool,
+                    "agent": agent,
+                    "calls": h.count,
+                    "errors": self.tool_calls.get((tool, agent, "error"), 0),
+                    **_latency_summary(h),
+                    "bytes_in_total": int(self.tool_bytes_in[(tool, agent)].sum),
+                    "bytes_out_total": int(self.tool_bytes_out[(tool, agent)].sum),
+                })
+            stages = [{"stage": stage, "agent": agent, "calls": h.count, **_latency_summary(h)}
+                      for (stage, agent), h in sorted(self.stage_latency.items())]
+        return {"started": self.started, "exported": time.time(), "tools": tools, "stages": stages}
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ---------- Profiling ----------
+_profile_lock = threading.Lock()
+_profiler_busy = threading.Lock()  # held while a profiled call runs
+_profiles: Dict[str, Any] = {}  # tool name -> pstats.Stats
+
+
+def _profile_targets() -> set:
+    return {t.strip() for t in os.getenv("CREW_PROFILE_TOOL", "").split(",") if t.strip()}
+
+
+def _call_profiled(tool: str, fn: Callable, args, kwargs):
+    # Python 3.12+ allows one active profiler per process, so calls that overlap a
+    # profiled call (or an outside profiler) run unprofiled instead of failing
+    if not _profiler_busy.acquire(blocking=False):
+        return fn(*args, **kwargs)
+    import cProfile, pstats
+    prof = cProfile.Profile()
+    try:
+        try:
+            prof.enable()
+        except ValueError:
+            prof = None
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+    finally:
+        _profiler_busy.release()
+        if prof is not None:
+            with _profile_lock:
+                if tool in _profiles:
+                    _profiles[tool].add(prof)
+                else:
+                    _profiles[tool] = pstats.Stats(prof)
+
+
+# ---------- Instrumentation API ----------
+@contextmanager
+def stage(name: str):
+    """Time an internal stage and attribute it to the current tool's agent."""
+    wall, start = time.time(), time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.record_stage(name, _current_agent.get() or "-", elapsed)
+        record_span(name, "stage", wall, wall + elapsed)
+
+
+def _begin_call(tool: str, agent: str):
+    return _current_tool.set(tool), _current_agent.set(agent), time.time(), time.perf_counter()
+
+
+def _end_call(tool: str, agent: str, state, payload, result, ok: bool) -> None:
+    tool_tok, agent_tok, wall, start = state
+    elapsed = time.perf_counter() - start
+    REGISTRY.record_tool(tool, agent, elapsed, _payload_size(payload), _payload_size(result) if ok else 0, ok)
+    record_span(f"{tool}._run", "tool_run", wall, wall + elapsed, {"agent": agent, "ok": ok})
+    _current_agent.reset(agent_tok)
+    _current_tool.reset(tool_tok)
+
+
+def _observe_call(tool: str, agent: str, fn: Callable, args, kwargs, payload):
+    state = _begin_call(tool, agent)
+    result, ok = None, False
+    try:
+        if tool in _profile_targets():
+            result = _call_profiled(tool, fn, args, kwargs)
+        else:
+            result = fn(*args, **kwargs)
+        ok = True
+        return result
+    finally:
+        _end_call(tool, agent, state, payload, result, ok)
+
+
+async def _aobserve_call(tool: str, agent: str, fn: Callable, args, kwargs, payload):
+    # Coroutines are not profiled: their CPU work runs on executor threads
+    state = _begin_call(tool, agent)
+    result, ok = None, False
+    try:
+        result = await fn(*args, **kwargs)
+        ok = True
+        return result
+    finally:
+        _end_call(tool, agent, state, payload, result, ok)
+
+
+def instrumented(fn: Callable) -> Callable:
+    """Decorator for `BaseTool._run` / `_arun` methods."""
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(self, *args, **kwargs):
+            if _current_tool.get() is not None:
+                return await fn(self, *args, **kwargs)
+            agent = _agent_label(self, args, kwargs)
+            return await _aobserve_call(self.name, agent, fn, (self,) + args, kwargs, payload=[list(args), kwargs])
+
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if _current_tool.get() is not None:
+            return fn(self, *args, **kwargs)
+        agent = _agent_label(self, args, kwargs)
+        return _observe_call(self.name, agent, fn, (self,) + args, kwargs, payload=[list(args), kwargs])
+
+    return wrapper
+
+
+def instrument_function(name: str, default_agent: str = "-") -> Callable:
+    """Decorator for plain tool functions such as the FastMCP handlers (sync or async)."""
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                if _current_tool.get() is not None:
+                    return await fn(*args, **kwargs)
+                agent = kwargs.get("agent") or kwargs.get("agent_scope") or default_agent
+                return await _aobserve_call(name, agent, fn, args, kwargs, payload=[list(args), kwargs])
+
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_tool.get() is not None:
+                return fn(*args, **kwargs)
+            agent = kwargs.get("agent") or kwargs.get("agent_scope") or default_agent
+            return _observe_call(name, agent, fn, args, kwargs, payload=[list(args), kwargs])
+
+        return wrapper
+
+    return decorator
+
+
+def bind_agent(tools: List[Any], agent: str) -> List[Any]:
+    """Label a list of tool instances with the agent that owns them."""
+    for t in tools:
+        # Use object.__setattr__ to bypass Pydantic validation for custom attributes
+        object.__setattr__(t, "metrics_agent", agent)
+    return tools
+
+
+def export(run_id: str, out_dir: Optional[str] = None) -> Dict[str, str]:
+    """Write <run_id>.metrics.prom, <run_id>.metrics.json and any cProfile dumps."""
+    out_dir = out_dir or RUNS_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "prometheus": os.path.join(out_dir, f"{run_id}.metrics.prom"),
+        "json": os.path.join(out_dir, f"{run_id}.metrics.json"),
+    }
+    with open(paths["prometheus"], "w", encoding="utf-8") as f:
+        f.write(REGISTRY.to_prometheus())
+    summary = REGISTRY.summary()
+    summary["run_id"] = run_id
+    with open(paths["json"], "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    with _profile_lock:
+        for tool, stats in _profiles.items():
+            paths[f"profile:{tool}"] = os.path.join(out_dir, f"{run_id}.{tool}.prof")
+            stats.dump_stats(paths[f"profile:{tool}"])
+    return paths
+
+
+# ---------- Helpers ----------
+def _agent_label(tool: Any, args, kwargs: Dict[str, Any]) -> str:
+    # Crew tools sometimes receive their arguments as a single dict
+    if args and isinstance(args[0], dict):
+        kwargs = {**args[0], **kwargs}
+    return (getattr(tool, "metrics_agent", None) or kwargs.get("agent") or kwargs.get("agent_scope")
+            or getattr(tool, "default_agent_scope", None) or "-")
+
+
+def _payload_size(obj: Any) -> int:
+    if obj is None:
+        return 0
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    try:
+        return len(json.dumps(obj, default=str))
+    except (TypeError, ValueError):
+        return len(str(obj))
+
+
+def _latency_summary(h: Histogram) -> Dict[str, float]:
+    return {
+        "total_s": round(h.sum, 6),
+        "mean_ms": round(1000 * h.sum / h.count, 3) if h.count else 0.0,
+        "p50_ms": round(1000 * h.quantile(0.50), 3),
+        "p95_ms": round(1000 * h.quantile(0.95), 3),
+        "p99_ms": round(1000 * h.quantile(0.99), 3),
+    }
+
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _labels(**kv: str) -> str:
+    esc = lambda s: str(s).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in kv.items()) + "}"
+
+
+def _prom_histogram(metric: str, help_text: str, label_names: Tuple[str, str],
+                    series: Dict[Tuple[str, str], Histogram]) -> List[str]:
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    for key, h in sorted(series.items()):
+        base = dict(zip(label_names, key))
+        for le, n in h.cumulative():
+            lines.append(f"{metric}_bucket{_labels(**base, le=le)} {n}")
+        lines.append(f"{metric}_sum{_labels(**base)} {h.sum}")
+        lines.append(f"{metric}_count{_labels(**base)} {h.count}")
+    return lines
@@ -4,153 +4,227 @@ RAG Setup Script
 
 This script ingests documents into the vector store for all agents.
 Run this separately when documents are added or updated.
+
+Sources (scope, namespace, directory, patterns) come from config/rag_sources.yaml.
+Chunks go to both the Chroma vector store and the BM25 lexical index.
+Scopes are ingested concurrently through one shared embedding model, and every
+ingested file is checkpointed (path, mtime, size), so a re-run only picks up new
+or changed files and an interrupted run resumes where it stopped. Files missing
+from the checkpoint whose content (sha256) is already in the store, e.g. after
+import_index, are recorded without re-embedding.
+
+    uv run setup_rag                          # ingest everything in the manifest
+    uv run setup_rag --only qa_engineer,shared --test-query
+    uv run setup_rag --fresh                  # ignore the checkpoint, re-ingest all files
 """
-from chitrank_crew.tools.custom_tool import AgentScopedRAGIngestTool, AgentScopedRAGQueryTool, RAGIngestTool, RAGQueryTool
-import json
+# Uses memory_core directly rather than the crewAI tool wrappers, so ingesting
+# doesn't pay for importing crewAI.
+import os, sys, time, sqlite3, argparse
+from typing import Any, Dict, List, Optional
+
+from chitrank_crew import memory_core
+
+MANIFEST = os.path.join(os.path.dirname(__file__), "config", "rag_sources.yaml")
+DOCS_DIR = memory_core.DOCS_DIR
+SCOPE_ICONS = {"shared": "📚", "software_engineer": "👨‍💻", "qa_engineer": "🧪",
+               "devops_engineer": "⚙️ ", "manager": "👔"}
 
 def prewarm_embedding_model():
     """Pre-warm the embedding model to avoid delay on first crew run"""
     print("🔥 Pre-warming embedding model (this may take 30-60 seconds on first run)...")
     try:
-        from chitrank_crew.tools.custom_tool import _ensure_vector_store
-        _ensure_vector_store()
+        memory_core._ensure_vector_store()
         print("   ✓ Embedding model loaded and ready!")
     except Exception as e:
         print(f"   ⚠️  Warning: Could not pre-warm model: {e}")
         print("   (This is okay, it will load on first use)")
 
-def ingest_shared():
-    """Ingest shared documents into RAG vector store"""
-    print("📚 Ingesting shared documents...")
-    ingest_tool = RAGIngestTool()
-    ingest_result = ingest_tool.run({
-        "directory": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/shared",
-        "agent_scope": "shared",
-        "namespace": "auth-feature",
-        "patterns": "*.pdf,*.txt",
-        "max_words": 300,
-        "overlap_words": 50
-    })
-    result = json.loads(ingest_result)
-    print(f"   ✓ Ingested {result.get('files', 0)} files, {result.get('chunks_added', 0)} chunks added")
-    
-    # Test query
-    print("   🔍 Testing query...")
-    query_tool = RAGQueryTool()
-    query_result = query_tool.run({
-        "query": "password reset token expiry and security considerations",
-        "top_k": 8,
-        "agent_scope": "shared",
-        "namespace": "auth-feature"
-    })
-    results = json.loads(query_result)
-    print(f"   ✓ Query returned {len(results)} results")
-
-
-def ingest_se():
-    """Ingest software engineer documents"""
-    print("\n👨‍💻 Ingesting software_engineer documents...")
-    ingest_tool = AgentScopedRAGIngestTool("software_engineer")
-    result = ingest_tool.run({
-        "directory": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/software_engineer",
-        "namespace": "se-auth-feature",
-        "patterns": "*.pdf,*.txt"
-    })
-    parsed = json.loads(result)
-    print(f"   ✓ Ingested {parsed.get('files', 0)} files, {parsed.get('chunks_added', 0)} chunks added")
-    
-    query_tool = AgentScopedRAGQueryTool("software_engineer")
-    query_result = query_tool.run({
-        "query": "password reset token expiry and security considerations",
-        "top_k": 8,
-        "namespace": "se-auth-feature"
-    })
-    results = json.loads(query_result)
-    print(f"   ✓ Query returned {len(results)} results")
-
-def ingest_qa():
-    """Ingest QA engineer documents"""
-    print("\n🧪 Ingesting qa_engineer documents...")
-    ingest_tool = AgentScopedRAGIngestTool("qa_engineer")
-    result = ingest_tool.run({
-        "directory": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/qa_engineer",
-        "namespace": "qa-auth-feature",
-        "patterns": "*.pdf,*.txt"
-    })
-    parsed = json.loads(result)
-    print(f"   ✓ Ingested {parsed.get('files', 0)} files, {parsed.get('chunks_added', 0)} chunks added")
-    
-    query_tool = AgentScopedRAGQueryTool("qa_engineer")
-    query_result = query_tool.run({
-        "query": "password reset token expiry and security considerations",
-        "top_k": 8,
-        "namespace": "qa-auth-feature"
-    })
-    results = json.loads(query_result)
-    print(f"   ✓ Query returned {len(results)} results")
-
-def ingest_devops():
-    """Ingest DevOps engineer documents"""
-    print("\n⚙️  Ingesting devops_engineer documents...")
-    ingest_tool = AgentScopedRAGIngestTool("devops_engineer")
-    result = ingest_tool.run({
-        "directory": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/devops_engineer",
-        "namespace": "devops-auth-feature",
-        "patterns": "*.pdf,*.txt"
-    })
-    parsed = json.loads(result)
-    print(f"   ✓ Ingested {parsed.get('files', 0)} files, {parsed.get('chunks_added', 0)} chunks added")
-    
-    query_tool = AgentScopedRAGQueryTool("devops_engineer")
-    query_result = query_tool.run({
-        "query": "password reset token expiry and security considerations",
-        "top_k": 8,
-        "namespace": "devops-auth-feature"
-    })
-    results = json.loads(query_result)
-    print(f"   ✓ Query returned {len(results)} results")
-
-def ingest_manager():
-    """Ingest manager documents"""
-    print("\n👔 Ingesting manager documents...")
-    ingest_tool = AgentScopedRAGIngestTool("manager")
-    result = ingest_tool.run({
-        "directory": "/Users/chitrankdixit/Documents/personal_projects/prabhu-ai/chitrank_crew/src/knowledge/docs/manager",
-        "namespace": "manager-auth-feature",
-        "patterns": "*.pdf,*.txt"
-    })
-    parsed = json.loads(result)
-    print(f"   ✓ Ingested {parsed.get('files', 0)} files, {parsed.get('chunks_added', 0)} chunks added")
-    
-    query_tool = AgentScopedRAGQueryTool("manager")
-    query_result = query_tool.run({
-        "query": "password reset token expiry and security considerations",
-        "top_k": 8,
-        "namespace": "manager-auth-feature"
-    })
-    results = json.loads(query_result)
-    print(f"   ✓ Query returned {len(results)} results")
-
-def initialize_rag():
+# ---------- Manifest ----------
+def load_sources(path: str = MANIFEST) -> Dict[str, Any]:
+    """Read the manifest; each source gets the defaults filled in and an absolute directory."""
+    import yaml
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = yaml.safe_load(f) or {}
+    defaults = {"patterns": "*.pdf,*.txt", "max_words": 300, "overlap_words": 50}
+    defaults.update(manifest.get("defaults") or {})
+    sources = []
+    for entry in manifest.get("sources") or []:
+        missing = [k for k in ("scope", "namespace", "directory") if not entry.get(k)]
+        if missing:
+            raise ValueError(f"{path}: source {entry} is missing {', '.join(missing)}")
+        source = {**defaults, **entry}
+        source["directory"] = os.path.join(DOCS_DIR, os.path.expanduser(source["directory"]))
+        sources.append(source)
+    return {"sources": sources, "test_query": manifest.get("test_query")}
+
+# ---------- Checkpoint ----------
+def _checkpoint_path() -> str:
+    # Lives next to the vector store it describes
+    return os.path.join(os.path.dirname(memory_core.VEC_DIR), "ingest_checkpoint.sqlite")
+
+def _open_checkpoint() -> sqlite3.Connection:
+    conn = sqlite3.connect(_checkpoint_path(), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("""
+      CREATE TABLE IF NOT EXISTS ingested_files (
+        path TEXT NOT NULL,
+        agent_scope TEXT NOT NULL,
+        namespace TEXT NOT NULL,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        chunks INTEGER NOT NULL,
+        ts REAL NOT NULL,
+        PRIMARY KEY (path, agent_scope, namespace)
+      );
+    """)
+    conn.commit()
+    return conn
+
+def reset_checkpoint(sources: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Forget ingested files for the given sources' scope/namespace pairs (all of them by default)."""
+    conn = _open_checkpoint()
+    try:
+        if sources is None:
+            conn.execute("DELETE FROM ingested_files")
+        else:
+            conn.executemany("DELETE FROM ingested_files WHERE agent_scope=? AND namespace=?",
+                             {(s["scope"], s["namespace"]) for s in sources})
+        conn.commit()
+    finally:
+        conn.close()
+
+# ---------- Ingest ----------
+def ingest_source(source: Dict[str, Any], fresh: bool = False) -> Dict[str, Any]:
+    """Ingest one scope, skipping files the checkpoint (or, unless `fresh`, the store) says are unchanged."""
+    scope, namespace = source["scope"], source["namespace"]
+    stats = {"scope": scope, "namespace": namespace, "files": 0, "skipped": 0,
+             "failed": 0, "chunks": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    if not os.path.isdir(source["directory"]):
+        stats["error"] = f"directory not found: {source['directory']}"
+        return stats
+    conn = _open_checkpoint()
+    try:
+        done = {path: (mtime, size) for path, mtime, size in conn.execute(
+            "SELECT path, mtime, size FROM ingested_files WHERE agent_scope=? AND namespace=?", (scope, namespace))}
+        for path in sorted(set(memory_core.collect_files(source["directory"], source["patterns"]))):
+            key, st = memory_core.source_key(path), os.stat(path)
+            if done.get(key) == (st.st_mtime, st.st_size):
+                stats["skipped"] += 1
+                continue
+            try:
+                digest = memory_core.file_digest(path)
+                stored_digest, chunks = memory_core.stored_file(path, scope, namespace)
+                if fresh or stored_digest != digest:
+                    # Drop chunks from an earlier version of the file (or a run that died mid-way)
+                    memory_core.delete_file_chunks(path, scope, namespace)
+                    chunks = memory_core.ingest_file(path, agent_scope=scope, namespace=namespace,
+                                                     max_words=source["max_words"],
+                                                     overlap_words=source["overlap_words"], digest=digest)
+                    stats["files"] += 1
+                    stats["chunks"] += chunks
+                else:
+                    stats["skipped"] += 1  # already in the store (imported snapshot, lost checkpoint)
+            except Exception:
+                stats["failed"] += 1
+                continue
+            conn.execute("INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, scope, namespace, st.st_mtime, st.st_size, chunks, time.time()))
+            conn.commit()
+    finally:
+        conn.close()
+        stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+def print_summary(results: List[Dict[str, Any]], wall_s: float) -> None:
+    print(f"\n{'scope':<18} {'namespace':<22} {'files':>6} {'skipped':>8} {'failed':>7} "
+          f"{'chunks':>7} {'time s':>7} {'files/s':>8} {'chunks/s':>9}")
+    for r in results:
+        secs = r["seconds"] or 1e-9
+        print(f"{r['scope']:<18} {r['namespace']:<22} {r['files']:>6} {r['skipped']:>8} {r['failed']:>7} "
+              f"{r['chunks']:>7} {r['seconds']:>7.2f} {r['files'] / secs:>8.1f} {r['chunks'] / secs:>9.1f}")
+    files, chunks = sum(r["files"] for r in results), sum(r["chunks"] for r in results)
+    print(f"{'total':<18} {'':<22} {files:>6} {sum(r['skipped'] for r in results):>8} "
+          f"{sum(r['failed'] for r in results):>7} {chunks:>7} {wall_s:>7.2f} "
+          f"{files / wall_s:>8.1f} {chunks / wall_s:>9.1f}")
+
+def initialize_rag(argv: Optional[List[str]] = None):
     """Initialize RAG by ingesting all agent documents"""
+    parser = argparse.ArgumentParser(prog="setup_rag", description="Ingest agent documents into the RAG vector store")
+    parser.add_argument("--manifest", default=MANIFEST, help="Sources manifest (YAML)")
+    parser.add_argument("--only", default=None, help="Comma-separated scopes to ingest (default: all)")
+    parser.add_argument("--workers", type=int, default=4, help="Scopes ingested concurrently")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint and re-ingest every file")
+    parser.add_argument("--test-query", nargs="?", const="", default=None,
+                        help="Run a test query per scope (default text: the manifest's test_query)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
     print("🚀 Starting RAG initialization...\n")
     try:
-        # Pre-warm embedding model first (downloads/loads on first run)
+        manifest = load_sources(args.manifest)
+        sources = manifest["sources"]
+        if args.only:
+            wanted = {s.strip() for s in args.only.split(",") if s.strip()}
+            known = {s["scope"] for s in sources}
+            if not wanted or wanted - known:
+                parser.error(f"--only: unknown scope(s) {', '.join(sorted(wanted - known)) or '(empty)'}; "
+                             f"{args.manifest} has {', '.join(sorted(known))}")
+            sources = [s for s in sources if s["scope"] in wanted]
+
+        # Pre-warm embedding model first (downloads/loads on first run); all scopes share it
         prewarm_embedding_model()
         print()  # Empty line for readability
-        
-        # Then ingest documents
-        ingest_shared()
-        ingest_se()
-        ingest_qa()
-        ingest_devops()
-        ingest_manager()
+
+        col = memory_core._ensure_collection()
+        if col.count() == 0:
+            # An empty store means the checkpoint (if any) describes data that is gone
+            reset_checkpoint()
+            memory_core.lexical_reset()
+        elif args.fresh:
+            # Only the scopes being re-ingested; the others keep their checkpoint and BM25 rows
+            reset_checkpoint(sources)
+            for s in sources:
+                memory_core.lexical_reset(s["scope"], s["namespace"])
+        elif memory_core.lexical_count() == 0:
+            # Store ingested before the BM25 index existed: index what is already there
+            print("🔤 Building the lexical (BM25) index from the existing store...")
+            print(f"   ✓ Indexed {memory_core.rebuild_lexical_index()} chunks\n")
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        print(f"📥 Ingesting {len(sources)} scope(s) with {min(args.workers, len(sources) or 1)} worker(s)...")
+        start = time.perf_counter()
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="setup-rag") as pool:
+            futures = {pool.submit(ingest_source, s, args.fresh): s for s in sources}
+            for fut in as_completed(futures):
+                r = fut.result()
+                results.append(r)
+                icon = SCOPE_ICONS.get(r["scope"], "📁")
+                if r.get("error"):
+                    print(f"   ⚠️  {r['scope']}: {r['error']}")
+                else:
+                    print(f"   ✓ {icon} {r['scope']}: {r['files']} files ingested, {r['skipped']} unchanged, "
+                          f"{r['chunks']} chunks added in {r['seconds']}s")
+        wall_s = time.perf_counter() - start or 1e-9
+        order = [s["scope"] for s in sources]
+        results.sort(key=lambda r: order.index(r["scope"]))
+        print_summary(results, wall_s)
+
+        if args.test_query is not None:
+            query = args.test_query or manifest.get("test_query")
+            if query:
+                print(f"\n🔍 Testing query: {query!r}")
+                for s in sources:
+                    hits = memory_core.rag_query(query, top_k=8, agent_scope=s["scope"], namespace=s["namespace"])
+                    print(f"   ✓ {s['scope']}: {len(hits)} results")
+
         print("\n✅ RAG initialization complete!")
         print("💡 Tip: The embedding model is now cached, future crew runs will be faster!")
+        return results
     except Exception as e:
         print(f"\n❌ Error during RAG initialization: {e}")
         raise
 
 
 if __name__ == "__main__":
-    initialize_rag()
\ No newline at end of file
+    initialize_rag()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Vector store snapshots for fast cold starts.
+
+Exports the `agent_long_term` Chroma collection to a versioned snapshot
+directory, and bulk-loads one back, so a fresh container can ship a prebuilt
+index instead of re-parsing and re-embedding the whole corpus with setup_rag:
+
+    manifest.json        format/version, count, dim, embedding model, sha256 + size per file
+    embeddings.f32       all vectors as one contiguous little-endian float32 (count x dim) array
+    records.jsonl.gz     one {"id", "document", "metadata"} line per vector, same row order
+
+The manifest is written last, so an interrupted export is never importable.
+Import verifies every checksum, the vector dimension and the embedding model
+before it touches the store, then upserts in batches and mirrors the RAG
+chunks into the BM25 lexical index. A file's chunks already in the store
+(any version, any id scheme) are replaced, not duplicated, so re-importing is
+idempotent. Only Chroma and SQLite are opened; the embedding model is not loaded.
+
+    uv run export_index --out snapshots/rag-v1
+    uv run import_index snapshots/rag-v1 [--replace]
+"""
+import os, sys, json, time, gzip, argparse
+from typing import Any, Dict, List, Optional
+
+from chitrank_crew import memory_core
+from chitrank_crew.metrics import stage
+
+FORMAT = "chitrank-crew-vector-snapshot"
+VERSION = 1
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.f32"
+RECORDS = "records.jsonl.gz"
+BATCH = 2000
+
+
+class SnapshotError(ValueError):
+    """The snapshot is incomplete, corrupted or incompatible with this store."""
+
+
+def _batch_size(requested: int) -> int:
+    # Chroma rejects writes larger than its max batch size
+    memory_core._ensure_collection()
+    return max(1, min(requested, memory_core._chroma.get_max_batch_size()))
+
+
+# ---------- Export ----------
+def export_snapshot(out_dir: str, batch: int = BATCH) -> Dict[str, Any]:
+    """Write the collection to `out_dir`; returns the manifest."""
+    import numpy as np
+
+    col = memory_core._ensure_collection()
+    batch = _batch_size(batch)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)  # a stale manifest must not describe new data files
+
+    count, dim = 0, None
+    emb_path, rec_path = os.path.join(out_dir, EMBEDDINGS), os.path.join(out_dir, RECORDS)
+    with open(emb_path, "wb") as emb_f, gzip.open(rec_path, "wt", encoding="utf-8") as rec_f:
+        total = col.count()
+        for offset in range(0, total, batch):
+            with stage("chroma.get"):
+                page = col.get(limit=batch, offset=offset, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype="<f4")
+            if dim is None:
+                dim = int(vectors.shape[1])
+            elif vectors.shape[1] != dim:
+                raise SnapshotError(f"mixed vector dimensions in collection ({dim} and {vectors.shape[1]})")
+            emb_f.write(np.ascontiguousarray(vectors).tobytes())
+            for doc_id, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                rec_f.write(json.dumps({"id": doc_id, "document": doc, "metadata": meta}) + "\n")
+            count += len(page["ids"])
+
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "collection": memory_core.COLLECTION,
+        "collection_metadata": col.metadata,
+        "embed_model": memory_core.EMBED_MODEL,
+        "count": count,
+        "dim": dim or 0,
+        "dtype": "<f4",
+        "files": {name: {"sha256": memory_core.file_digest(os.path.join(out_dir, name)),
+                         "bytes": os.path.getsize(os.path.join(out_dir, name))}
+                  for name in (EMBEDDINGS, RECORDS)},
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ---------- Import ----------
+def load_manifest(snapshot_dir: str, verify: bool = True) -> Dict[str, Any]:
+    """Read and validate a snapshot's manifest (and, with `verify`, its checksums)."""
+    path = os.path.join(snapshot_dir, MANIFEST)
+    if not os.path.exists(path):
+        raise SnapshotError(f"{path} not found (incomplete export?)")
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT:
+        raise SnapshotError(f"not a vector snapshot: format={manifest.get('format')!r}")
+    if manifest.get("version", 0) > VERSION:
+        raise SnapshotError(f"snapshot version {manifest['version']} is newer than supported ({VERSION})")
+    expected = manifest["count"] * manifest["dim"] * 4
+    for name, info in manifest["files"].items():
+        file_path = os.path.join(snapshot_dir, name)
+        if not os.path.exists(file_path):
+            raise SnapshotError(f"{name} is missing")
+        if os.path.getsize(file_path) != info["bytes"]:
+            raise SnapshotError(f"{name} is {os.path.getsize(file_path)} bytes, manifest says {info['bytes']}")
+        if verify and memory_core.file_digest(file_path) != info["sha256"]:
+            raise SnapshotError(f"{name} failed its sha256 check")
+    if manifest["files"][EMBEDDINGS]["bytes"] != expected:
+        raise SnapshotError(f"{EMBEDDINGS} does not hold {manifest['count']} x {manifest['dim']} float32 vectors")
+    return manifest
+
+
+def import_snapshot(snapshot_dir: str, replace: bool = False, batch: int = BATCH,
+                    verify: bool = True, allow_model_mismatch: bool = False) -> Dict[str, Any]:
+    """Bulk-load a snapshot into the collection; returns counts and timing."""
+    import numpy as np
+
+    manifest = load_manifest(snapshot_dir, verify=verify)
+    if manifest["embed_model"] != memory_core.EMBED_MODEL and not allow_model_mismatch:
+        raise SnapshotError(f"snapshot was embedded with {manifest['embed_model']}, "
+                            f"this store queries with {memory_core.EMBED_MODEL}")
+    start = time.perf_counter()
+    col = memory_core._ensure_collection()
+    if replace:
+        with memory_core._init_lock:
+            memory_core._chroma.delete_collection(memory_core.COLLECTION)
+            memory_core._collection = memory_core._chroma.create_collection(
+                name=memory_core.COLLECTION, metadata=manifest.get("collection_metadata") or None)
+            col = memory_core._collection
+        memory_core.lexical_reset()
+    batch = _batch_size(batch)
+    # Files whose existing chunks were dropped; None when the store started empty
+    cleared = set() if col.count() else None
+
+    count, dim = manifest["count"], manifest["dim"]
+    vectors = np.memmap(os.path.join(snapshot_dir, EMBEDDINGS), dtype="<f4", mode="r", shape=(count, dim)) \
+        if count else np.zeros((0, dim), dtype="<f4")
+    loaded = 0
+    ids: List[str] = []
+    docs: List[str] = []
+    metas: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal loaded
+        # RAG chunks only, not vector_remember notes
+        rag = [(i, d, m) for i, d, m in zip(ids, docs, metas) if m and m.get("path")]
+        if cleared is not None:
+            # Replace what the store holds for each file (an earlier ingest with other ids or content)
+            for source in {(m["path"], m.get("agent_scope"), m.get("namespace")) for _, _, m in rag} - cleared:
+                memory_core.delete_source_chunks([source[0]], source[1], source[2])
+                cleared.add(source)
+        with stage("chroma.upsert"):
+            col.upsert(ids=ids, documents=docs, metadatas=metas,
+                       embeddings=np.array(vectors[loaded:loaded + len(ids)]))
+        # Keep the BM25 index in step
+        if rag:
+            memory_core.lexical_add([r[0] for r in rag], [r[1] for r in rag], [r[2] for r in rag])
+        loaded += len(ids)
+        ids.clear()
+        docs.clear()
+        metas.clear()
+
+    with gzip.open(os.path.join(snapshot_dir, RECORDS), "rt", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            ids.append(rec["id"])
+            docs.append(rec["document"])
+            metas.append(rec["metadata"])
+            if len(ids) >= batch:
+                flush()
+    if ids:
+        flush()
+    if loaded != count:
+        raise SnapshotError(f"{RECORDS} has {loaded} records, manifest says {count}")
+    return {"loaded": loaded, "collection_count": col.count(), "seconds": round(time.perf_counter() - start, 2)}
+
+
+# ---------- CLI ----------
+def export_index(argv: Optional[List[str]] = None):
+    """Export the RAG/long-term vector collection to a snapshot directory."""
+    parser = argparse.ArgumentParser(prog="export_index", description=export_index.__doc__)
+    parser.add_argument("--out", required=True, help="Snapshot directory to write")
+    parser.add_argument("--batch", type=int, default=BATCH, help="Vectors read per Chroma call")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    print(f"📦 Exporting '{memory_core.COLLECTION}' from {memory_core.VEC_DIR}...")
+    start = time.perf_counter()
+    manifest = export_snapshot(args.out, batch=args.batch)
+    size_mb = sum(f["bytes"] for f in manifest["files"].values()) / 1e6
+    print(f"✅ {manifest['count']} vectors (dim {manifest['dim']}), {size_mb:.1f} MB "
+          f"in {time.perf_counter() - start:.1f}s -> {args.out}")
+    return manifest
+
+
+def import_index(argv: Optional[List[str]] = None):
+    """Load a snapshot directory into the RAG/long-term vector collection."""
+    parser = argparse.ArgumentParser(prog="import_index", description=import_index.__doc__)
+    parser.add_argument("snapshot", help="Snapshot directory written by export_index")
+    parser.add_argument("--replace", action="store_true", help="Drop the existing collection first")
+    parser.add_argument("--batch", type=int, default=BATCH, help="Vectors written per Chroma call")
+    parser.add_argument("--no-verify", action="store_true", help="Skip sha256 checks (sizes are still checked)")
+    parser.add_argument("--allow-model-mismatch", action="store_true",
+                        help="Load vectors embedded with a different model")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    print(f"📥 Importing {args.snapshot} into {memory_core.VEC_DIR}...")
+    try:
+        result = import_snapshot(args.snapshot, replace=args.replace, batch=args.batch,
+                                 verify=not args.no_verify, allow_model_mismatch=args.allow_model_mismatch)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Loaded {result['loaded']} vectors in {result['seconds']}s "
+          f"(collection now has {result['collection_count']})")
+    return result
@@ -1,34 +1,29 @@
+from abc import abstractmethod
 from crewai.tools import BaseTool
-from typing import Type, List
+from typing import Any, Type, List, Optional
 from pydantic import BaseModel, Field
-import os, json, time, sqlite3
-
-# ---------- Paths ----------
-ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-MEM_DIR = os.path.join(ROOT_DIR, "knowledge", "memory")
-VEC_DIR = os.path.join(ROOT_DIR, "knowledge", "vector_store")
-ST_DB = os.path.join(ROOT_DIR, "knowledge", "short_term.sqlite")
-os.makedirs(MEM_DIR, exist_ok=True)
-os.makedirs(VEC_DIR, exist_ok=True)
-
-# ---------- Long-term Vector Memory (Chroma) ----------
-# Lazy imports to avoid import cost if unused
-_chroma = None
-_embedder = None
-_collection = None
-
-def _ensure_vector_store():
-    global _chroma, _embedder, _collection
-    if _chroma is None:
-        import chromadb
-        from chromadb.config import Settings
-        _chroma = chromadb.PersistentClient(path=VEC_DIR, settings=Settings(anonymized_telemetry=False))
-    if _embedder is None:
-        from sentence_transformers import SentenceTransformer
-        _embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    if _collection is None:
-        _collection = _chroma.get_or_create_collection(name="agent_long_term")
-    return _collection, _embedder
+import json
+from chitrank_crew import memory_core
+from chitrank_crew.metrics import instrumented
+
+# Tools are thin crewAI wrappers; the storage/RAG logic lives in memory_core
+# (paths, lazy Chroma/embedder/pypdf loading, SQLite schema).
+# Each tool has a sync `_run` and a native async `_arun`. crewAI itself only
+# calls `run` (Crew.kickoff_async just runs kickoff on a thread); `arun` is for
+# callers with their own event loop, and offloads encodes to memory_core's CPU
+# pool and Chroma/SQLite calls to its IO pool.
+
+class MemoryTool(BaseTool):
+    """Base for the memory/RAG tools: adds `arun`, the async counterpart of `run`."""
+
+    async def arun(self, *args: Any, **kwargs: Any) -> Any:
+        result = await self._arun(*args, **kwargs)
+        self.current_usage_count += 1
+        return result
+
+    @abstractmethod
+    async def _arun(self, *args: Any, **kwargs: Any) -> Any:
+        """Async implementation of the tool."""
 
 class VRememberInput(BaseModel):
     agent: str = Field(..., description="Agent id, e.g. 'manager', 'software_engineer'")
@@ -40,62 +35,35 @@ class VRecallInput(BaseModel):
     query: str = Field(..., description="Search query")
     top_k: int = Field(5, description="Max results")
 
-class VectorRememberTool(BaseTool):
+class VectorRememberTool(MemoryTool):
     name: str = "vector_remember"
     description: str = "Persist a note to long-term vector memory for an agent"
     args_schema: Type[BaseModel] = VRememberInput
 
+    @instrumented
     def _run(self, agent: str, text: str, tags: List[str] = None) -> str:
-        col, emb = _ensure_vector_store()
-        doc_id = f"{agent}:{int(time.time()*1000)}"
-        # ChromaDB metadata doesn't accept lists, so convert tags to JSON string
-        tags_list = tags or []
-        meta = {"agent": agent, "tags": json.dumps(tags_list)}
-        vec = emb.encode([text]).tolist()[0]
-        col.add(ids=[doc_id], documents=[text], metadatas=[meta], embeddings=[vec])
+        memory_core.vector_remember(agent, text, tags)
+        return "saved"
+
+    @instrumented
+    async def _arun(self, agent: str, text: str, tags: List[str] = None) -> str:
+        await memory_core.avector_remember(agent, text, tags)
         return "saved"
 
-class VectorRecallTool(BaseTool):
+class VectorRecallTool(MemoryTool):
     name: str = "vector_recall"
     description: str = "Search long-term vector memory for an agent and return the most relevant notes (JSON)"
     args_schema: Type[BaseModel] = VRecallInput
 
+    @instrumented
     def _run(self, agent: str, query: str, top_k: int = 5) -> str:
-        col, emb = _ensure_vector_store()
-        qv = emb.encode([query]).tolist()[0]
-        res = col.query(query_embeddings=[qv], n_results=top_k, where={"agent": agent})
-        docs = (res.get("documents") or [[]])[0]
-        metas = (res.get("metadatas") or [[]])[0]
-        scores = (res.get("distances") or [[]])[0]  # lower is better in Chroma 0.5 by default
-        out = []
-        for d, m, s in zip(docs, metas, scores):
-            # Parse tags from JSON string (ChromaDB doesn't support lists in metadata)
-            tags_str = m.get("tags", "[]")
-            try:
-                tags_list = json.loads(tags_str) if isinstance(tags_str, str) else (tags_str or [])
-            except (json.JSONDecodeError, TypeError):
-                tags_list = []
-            out.append({"text": d, "agent": m.get("agent"), "tags": tags_list, "score": float(s)})
-        return json.dumps(out)
+        return json.dumps(memory_core.vector_recall(agent, query, top_k))
 
-# ---------- Short-term Memory (SQLite) ----------
-def _ensure_sqlite():
-    conn = sqlite3.connect(ST_DB)
-    cur = conn.cursor()
-    cur.execute("""
-      CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        session TEXT NOT NULL,
-        agent TEXT NOT NULL,
-        role TEXT NOT NULL,       -- 'user' | 'assistant' | 'system' | 'note'
-        content TEXT NOT NULL,
-        ts REAL NOT NULL
-      );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session, ts);")
-    conn.commit()
-    return conn
+    @instrumented
+    async def _arun(self, agent: str, query: str, top_k: int = 5) -> str:
+        return json.dumps(await memory_core.avector_recall(agent, query, top_k))
 
+# ---------- Short-term Memory (SQLite) ----------
 class STStoreInput(BaseModel):
     session: str = Field(..., description="Conversation/session id")
     agent: str = Field(..., description="Agent id")
@@ -105,67 +73,39 @@ class STStoreInput(BaseModel):
 class STFetchInput(BaseModel):
     session: str = Field(..., description="Conversation/session id")
     limit: int = Field(10, description="Max items to fetch, newest first")
+    mode: str = Field("raw", description="'raw' rows, or 'summary': rolling session summary + newest rows within token_budget")
+    token_budget: Optional[int] = Field(None, description="Token budget for mode='summary' (default 800)")
 
-class STStoreTool(BaseTool):
+class STStoreTool(MemoryTool):
     name: str = "st_store"
     description: str = "Store a short-term message in SQLite for this session"
     args_schema: Type[BaseModel] = STStoreInput
 
+    @instrumented
     def _run(self, session: str, agent: str, role: str, content: str) -> str:
-        conn = _ensure_sqlite()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO messages(session, agent, role, content, ts) VALUES (?, ?, ?, ?, ?)",
-                    (session, agent, role, content, time.time()))
-        conn.commit()
-        conn.close()
+        memory_core.st_store(session, agent, role, content)
+        return "stored"
+
+    @instrumented
+    async def _arun(self, session: str, agent: str, role: str, content: str) -> str:
+        await memory_core.ast_store(session, agent, role, content)
         return "stored"
 
-class STFetchTool(BaseTool):
+class STFetchTool(MemoryTool):
     name: str = "st_fetch"
-    description: str = "Fetch recent short-term messages from SQLite for a session (JSON)"
+    description: str = ("Fetch recent short-term messages from SQLite for a session (JSON). "
+                        "Use mode='summary' for a compact session summary plus the newest messages.")
     args_schema: Type[BaseModel] = STFetchInput
 
-    def _run(self, session: str, limit: int = 10) -> str:
-        conn = _ensure_sqlite()
-        cur = conn.cursor()
-        cur.execute("SELECT agent, role, content, ts FROM messages WHERE session=? ORDER BY ts DESC LIMIT ?", (session, limit))
-        rows = cur.fetchall()
-        conn.close()
-        out = [{"agent": a, "role": r, "content": c, "ts": t} for (a, r, c, t) in rows]
-        return json.dumps(out)
+    @instrumented
+    def _run(self, session: str, limit: int = 10, mode: str = "raw", token_budget: Optional[int] = None) -> str:
+        return json.dumps(memory_core.st_fetch(session, limit, mode, token_budget))
 
-# ---------- RAG: Ingest PDFs and TXT into Chroma, and query ----------
+    @instrumented
+    async def _arun(self, session: str, limit: int = 10, mode: str = "raw", token_budget: Optional[int] = None) -> str:
+        return json.dumps(await memory_core.ast_fetch(session, limit, mode, token_budget))
 
-from typing import Optional, Dict
-import re
-from pydantic import BaseModel, Field
-from pypdf import PdfReader
-
-def _read_pdf(path: str) -> str:
-    reader = PdfReader(path)
-    texts = []
-    for page in reader.pages:
-        try:
-            texts.append(page.extract_text() or "")
-        except Exception:
-            continue
-    return "\n".join(texts)
-
-def _read_txt(path: str) -> str:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
-
-def _chunk_text(text: str, max_words: int = 300, overlap_words: int = 50):
-    words = re.findall(r"\S+", text)
-    chunks = []
-    i = 0
-    while i < len(words):
-        chunk = words[i:i+max_words]
-        chunks.append(" ".join(chunk))
-        if i + max_words >= len(words):
-            break
-        i += max_words - overlap_words
-    return chunks
+# ---------- RAG: Ingest PDFs and TXT into Chroma, and query ----------
 
 class IngestInput(BaseModel):
     directory: str = Field(..., description="Directory containing files to ingest")
@@ -175,14 +115,13 @@ class IngestInput(BaseModel):
     max_words: int = Field(300, description="Chunk size in words")
     overlap_words: int = Field(50, description="Chunk overlap in words")
 
-class RAGIngestTool(BaseTool):
+class RAGIngestTool(MemoryTool):
     name: str = "rag_ingest"
     description: str = "Ingest PDFs/TXT from a directory into vector store with metadata (agent_scope, namespace)"
     args_schema: Type[BaseModel] = IngestInput
 
-    def _run(self, directory: str = None, agent_scope: str = "shared", namespace: str = "default",
-             patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50, **kwargs) -> str:
-        import glob, os, json, time
+    @staticmethod
+    def _resolve_args(directory, agent_scope, namespace, patterns, max_words, overlap_words, kwargs) -> dict:
         # Handle case where arguments are passed as a dict (CrewAI BaseTool behavior)
         if isinstance(directory, dict):
             kwargs = directory
@@ -200,53 +139,40 @@ class RAGIngestTool(BaseTool):
             patterns = kwargs.get("patterns", patterns)
             max_words = kwargs.get("max_words", max_words)
             overlap_words = kwargs.get("overlap_words", overlap_words)
-        
-        if not directory:
+        return dict(directory=directory, agent_scope=agent_scope, namespace=namespace,
+                    patterns=patterns, max_words=max_words, overlap_words=overlap_words)
+
+    @instrumented
+    def _run(self, directory: str = None, agent_scope: str = "shared", namespace: str = "default",
+             patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50, **kwargs) -> str:
+        args = self._resolve_args(directory, agent_scope, namespace, patterns, max_words, overlap_words, kwargs)
+        if not args["directory"]:
             return json.dumps({"error": "directory parameter is required"})
-        
-        col, emb = _ensure_vector_store()
-        pats = [p.strip() for p in patterns.split(",") if p.strip()]
-        files = []
-        for p in pats:
-            files.extend(glob.glob(os.path.join(directory, p), recursive=True))
-
-        added = 0
-        for path in files:
-            try:
-                ext = os.path.splitext(path)[1].lower()
-                if ext == ".pdf":
-                    text = _read_pdf(path)
-                elif ext == ".txt":
-                    text = _read_txt(path)
-                else:
-                    continue
-                if not text.strip():
-                    continue
-                chunks = _chunk_text(text, max_words=max_words, overlap_words=overlap_words)
-                if not chunks:
-                    continue
-                embeds = emb.encode(chunks).tolist()
-                ids = [f"{path}:{i}:{int(time.time()*1000)}" for i in range(len(chunks))]
-                metas = [{"path": path, "agent_scope": agent_scope, "namespace": namespace, "chunk": i} for i in range(len(chunks))]
-                col.add(ids=ids, documents=chunks, metadatas=metas, embeddings=embeds)
-                added += len(chunks)
-            except Exception:
-                continue
-        return json.dumps({"files": len(set(files)), "chunks_added": added})
+        return json.dumps(memory_core.rag_ingest(**args))
+
+    @instrumented
+    async def _arun(self, directory: str = None, agent_scope: str = "shared", namespace: str = "default",
+                    patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50, **kwargs) -> str:
+        args = self._resolve_args(directory, agent_scope, namespace, patterns, max_words, overlap_words, kwargs)
+        if not args["directory"]:
+            return json.dumps({"error": "directory parameter is required"})
+        return json.dumps(await memory_core.arag_ingest(**args))
 
 class RAGQueryInput(BaseModel):
     query: str = Field(..., description="Search query")
     top_k: int = Field(5, description="Max results")
     agent_scope: Optional[str] = Field(None, description="Filter by agent_scope")
     namespace: Optional[str] = Field(None, description="Filter by namespace")
+    mode: str = Field("auto", description="'auto' (exact match for identifiers), 'hybrid', 'vector' or 'lexical'")
 
-class RAGQueryTool(BaseTool):
+class RAGQueryTool(MemoryTool):
     name: str = "rag_query"
-    description: str = "Query the vector store for relevant chunks; returns JSON array with text, path, score."
+    description: str = ("Query the ingested documents for relevant chunks; returns JSON array with text, path, score. "
+                        "Exact identifiers (config keys, error codes, file names) are matched lexically.")
     args_schema: Type[BaseModel] = RAGQueryInput
 
-    def _run(self, query: str = None, top_k: int = 5, agent_scope: Optional[str] = None, namespace: Optional[str] = None, **kwargs) -> str:
-        import json
+    @staticmethod
+    def _resolve_args(query, top_k, agent_scope, namespace, mode, kwargs) -> dict:
         # Handle case where arguments are passed as a dict (CrewAI BaseTool behavior)
         if isinstance(query, dict):
             kwargs = query
@@ -254,45 +180,31 @@ class RAGQueryTool(BaseTool):
             top_k = kwargs.get("top_k", 5)
             agent_scope = kwargs.get("agent_scope")
             namespace = kwargs.get("namespace")
+            mode = kwargs.get("mode", "auto")
         elif kwargs:
             # If kwargs are provided separately, use them to override defaults
             query = kwargs.get("query", query)
             top_k = kwargs.get("top_k", top_k)
             agent_scope = kwargs.get("agent_scope", agent_scope)
             namespace = kwargs.get("namespace", namespace)
-        
-        if not query:
+            mode = kwargs.get("mode", mode)
+        return dict(query=query, top_k=top_k, agent_scope=agent_scope, namespace=namespace, mode=mode)
+
+    @instrumented
+    def _run(self, query: str = None, top_k: int = 5, agent_scope: Optional[str] = None, namespace: Optional[str] = None,
+             mode: str = "auto", **kwargs) -> str:
+        args = self._resolve_args(query, top_k, agent_scope, namespace, mode, kwargs)
+        if not args["query"]:
             return json.dumps({"error": "query parameter is required"})
-        
-        col, emb = _ensure_vector_store()
-        # Build where filter: ChromaDB requires $and operator for multiple conditions
-        where = None
-        conditions = []
-        if agent_scope:
-            conditions.append({"agent_scope": agent_scope})
-        if namespace:
-            conditions.append({"namespace": namespace})
-        
-        if len(conditions) == 1:
-            where = conditions[0]
-        elif len(conditions) > 1:
-            where = {"$and": conditions}
-        
-        qv = emb.encode([query]).tolist()[0]
-        res = col.query(query_embeddings=[qv], n_results=top_k, where=where)
-        docs = (res.get("documents") or [[]])[0]
-        metas = (res.get("metadatas") or [[]])[0]
-        scores = (res.get("distances") or [[]])[0]
-        out = []
-        for d, m, s in zip(docs, metas, scores):
-            out.append({
-                "text": d,
-                "path": m.get("path"),
-                "agent_scope": m.get("agent_scope"),
-                "namespace": m.get("namespace"),
-                "score": float(s)
-            })
-        return json.dumps(out)
+        return json.dumps(memory_core.rag_query(**args))
+
+    @instrumented
+    async def _arun(self, query: str = None, top_k: int = 5, agent_scope: Optional[str] = None, namespace: Optional[str] = None,
+                    mode: str = "auto", **kwargs) -> str:
+        args = self._resolve_args(query, top_k, agent_scope, namespace, mode, kwargs)
+        if not args["query"]:
+            return json.dumps({"error": "query parameter is required"})
+        return json.dumps(await memory_core.arag_query(**args))
 
 class AgentScopedRAGIngestTool(RAGIngestTool):
     def __init__(self, default_agent_scope: str):
@@ -300,6 +212,7 @@ class AgentScopedRAGIngestTool(RAGIngestTool):
         # Use object.__setattr__ to bypass Pydantic validation for custom attributes
         object.__setattr__(self, 'default_agent_scope', default_agent_scope)
 
+    @instrumented
     def _run(self, directory: str = None, agent_scope: str = None, namespace: str = "default",
              patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50, **kwargs) -> str:
         # Get default_agent_scope using object.__getattribute__ or direct access (should work after __setattr__)
@@ -308,14 +221,30 @@ class AgentScopedRAGIngestTool(RAGIngestTool):
         return super()._run(directory=directory, agent_scope=agent_scope, namespace=namespace,
                             patterns=patterns, max_words=max_words, overlap_words=overlap_words, **kwargs)
 
+    @instrumented
+    async def _arun(self, directory: str = None, agent_scope: str = None, namespace: str = "default",
+                    patterns: str = "*.pdf,*.txt", max_words: int = 300, overlap_words: int = 50, **kwargs) -> str:
+        agent_scope = agent_scope or getattr(self, 'default_agent_scope', None)
+        return await super()._arun(directory=directory, agent_scope=agent_scope, namespace=namespace,
+                                   patterns=patterns, max_words=max_words, overlap_words=overlap_words, **kwargs)
+
 class AgentScopedRAGQueryTool(RAGQueryTool):
     def __init__(self, default_agent_scope: str):
         super().__init__()
         # Use object.__setattr__ to bypass Pydantic validation for custom attributes
         object.__setattr__(self, 'default_agent_scope', default_agent_scope)
 
-    def _run(self, query: str = None, top_k: int = 5, agent_scope: str = None, namespace: str = None, **kwargs) -> str:
+    @instrumented
+    def _run(self, query: str = None, top_k: int = 5, agent_scope: str = None, namespace: str = None,
+             mode: str = "auto", **kwargs) -> str:
         # Get default_agent_scope using getattr
         default_scope = getattr(self, 'default_agent_scope', None)
         agent_scope = agent_scope or default_scope
-        return super()._run(query=query, top_k=top_k, agent_scope=agent_scope, namespace=namespace, **kwargs)
\ No newline at end of file
+        return super()._run(query=query, top_k=top_k, agent_scope=agent_scope, namespace=namespace, mode=mode, **kwargs)
+
+    @instrumented
+    async def _arun(self, query: str = None, top_k: int = 5, agent_scope: str = None, namespace: str = None,
+                    mode: str = "auto", **kwargs) -> str:
+        agent_scope = agent_scope or getattr(self, 'default_agent_scope', None)
+        return await super()._arun(query=query, top_k=top_k, agent_scope=agent_scope, namespace=namespace,
+                                   mode=mode, **kwargs)
@@ -0,0 +1,207 @@
+"""
+Per-run span timeline in Chrome trace-event format.
+
+`run_trace(session)` records, for one crew kickoff, nested spans for the crew,
+each task, each LLM call and each tool call (from crewAI's event bus), plus our
+own tool `_run` and internal stage spans (from `chitrank_crew.metrics`). The
+result is written to <runs dir>/<session>.trace.json and can be opened in
+chrome://tracing or https://ui.perfetto.dev to find the critical path.
+
+Tracing is off unless CREW_TRACE=1 (or `enabled=True` is passed).
+"""
+import os, json, time, threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+CREW_LANE = "crew"
+
+# Trace currently being recorded (one per process)
+_active: Optional["RunTrace"] = None
+_listener = None
+
+
+class RunTrace:
+    """Collects spans for a single run and serializes them as trace events."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.t0 = time.time()
+        self.path: Optional[str] = None
+        self.crew_thread = threading.get_ident()
+        self._lock = threading.Lock()
+        self._spans: List[Dict[str, Any]] = []
+        # crewAI events arrive on handler threads in no particular order, so they are
+        # stored raw as (ts, phase, kind, key, name, args) and paired when writing
+        self._marks: List[Tuple[float, str, str, str, str, Dict[str, Any]]] = []
+        self._crew_done = threading.Event()
+
+    def add_span(self, name: str, cat: str, start: float, end: float, lane: str, args: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._spans.append({"name": name, "cat": cat, "start": start, "end": end, "lane": lane, "args": args or {}})
+
+    def mark(self, ts: float, phase: str, kind: str, key: str, name: str, args: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._marks.append((ts, phase, kind, key, name, args or {}))
+        if kind == "crew" and phase == "E":
+            self._crew_done.set()
+
+    def current_lane(self) -> str:
+        if threading.get_ident() == self.crew_thread:
+            return CREW_LANE
+        return threading.current_thread().name
+
+    def _paired_spans(self, end_of_trace: float) -> List[Dict[str, Any]]:
+        spans = []
+        open_marks: Dict[Tuple[str, str], List[Tuple[float, str, Dict[str, Any]]]] = {}
+        for ts, phase, kind, key, name, args in sorted(self._marks, key=lambda m: (m[0], m[1] == "B")):
+            if phase == "B":
+                open_marks.setdefault((kind, key), []).append((ts, name, args))
+            elif open_marks.get((kind, key)):
+                start, start_name, start_args = open_marks[(kind, key)].pop()
+                spans.append({"name": start_name or name, "cat": kind, "start": start, "end": ts,
+                              "lane": CREW_LANE, "args": {**start_args, **args}})
+        for (kind, _), stack in open_marks.items():
+            for start, name, args in stack:
+                spans.append({"name": name, "cat": kind, "start": start, "end": end_of_trace,
+                              "lane": CREW_LANE, "args": {**args, "incomplete": True}})
+        return spans
+
+    def to_chrome(self) -> Dict[str, Any]:
+        end_of_trace = time.time()
+        with self._lock:
+            spans = self._spans + self._paired_spans(end_of_trace)
+        lanes = {CREW_LANE: 1}
+        events: List[Dict[str, Any]] = [
+            {"ph": "M", "name": "process_name", "pid": 1, "tid": 0, "args": {"name": f"crew run {self.run_id}"}},
+        ]
+        # Outer spans first so viewers nest equal-start spans correctly
+        for s in sorted(spans, key=lambda s: (s["start"], -(s["end"] - s["start"]))):
+            tid = lanes.setdefault(s["lane"], len(lanes) + 1)
+            events.append({
+                "name": s["name"],
+                "cat": s["cat"],
+                "ph": "X",
+                "pid": 1,
+                "tid": tid,
+                "ts": round((s["start"] - self.t0) * 1e6, 1),
+                "dur": round(max(0.0, s["end"] - s["start"]) * 1e6, 1),
+                "args": s["args"],
+            })
+        for lane, tid in lanes.items():
+            events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": lane}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"session": self.run_id, "started": self.t0}}
+
+    def write(self, out_dir: Optional[str] = None) -> str:
+        # metrics imports this module, so resolve the shared runs dir lazily
+        from chitrank_crew.metrics import RUNS_DIR
+        out_dir = out_dir or RUNS_DIR
+        os.makedirs(out_dir, exist_ok=True)
+        self.path = os.path.join(out_dir, f"{self.run_id}.trace.json")
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f, default=str)
+        return self.path
+
+
+def record_span(name: str, cat: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+    """Add a finished span on the calling thread's lane; no-op unless a trace is active."""
+    tr = _active
+    if tr is not None:
+        tr.add_span(name, cat, start, end, tr.current_lane(), args)
+
+
+def is_active() -> bool:
+    return _active is not None
+
+
+# ---------- crewAI event hooks ----------
+def _ts(event: Any, attr: str = "timestamp") -> float:
+    value = getattr(event, attr, None)
+    return value.timestamp() if value is not None else time.time()
+
+
+def _task_key(event: Any) -> str:
+    task = getattr(event, "task", None)
+    return str(getattr(task, "id", None) or getattr(event, "task_id", None) or "-")
+
+
+def _task_name(event: Any) -> str:
+    task = getattr(event, "task", None)
+    name = getattr(task, "name", None) or getattr(event, "task_name", None) or getattr(task, "description", "") or "task"
+    return f"task: {name[:80]}"
+
+
+def _llm_key(event: Any) -> str:
+    return f"{getattr(event, 'agent_id', None) or '-'}:{getattr(event, 'task_id', None) or '-'}"
+
+
+def _tool_key(event: Any) -> str:
+    return f"{getattr(event, 'agent_id', None) or getattr(event, 'agent_key', None) or '-'}:{event.tool_name}"
+
+
+def _install_listener():
+    """Register our handlers on crewAI's event bus once per process."""
+    global _listener
+    if _listener is not None:
+        return
+    from crewai.events import (
+        BaseEventListener, CrewKickoffStartedEvent, CrewKickoffCompletedEvent, CrewKickoffFailedEvent,
+        TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+        LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+        ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+    )
+
+    def _mark(phase: str, kind: str, key_fn, name_fn=None, args_fn=None):
+        def handler(source, event):
+            tr = _active
+            if tr is None:
+                return
+            tr.mark(_ts(event), phase, kind, key_fn(event), name_fn(event) if name_fn else "",
+                    args_fn(event) if args_fn else {})
+        return handler
+
+    class TraceListener(BaseEventListener):
+        def setup_listeners(self, bus):
+            crew_key = lambda e: "crew"
+            bus.on(CrewKickoffStartedEvent)(_mark("B", "crew", crew_key, lambda e: "crew kickoff"))
+            bus.on(CrewKickoffCompletedEvent)(_mark("E", "crew", crew_key, args_fn=lambda e: {"total_tokens": e.total_tokens}))
+            bus.on(CrewKickoffFailedEvent)(_mark("E", "crew", crew_key, args_fn=lambda e: {"error": e.error}))
+            bus.on(TaskStartedEvent)(_mark("B", "task", _task_key, _task_name,
+                                           lambda e: {"agent": getattr(getattr(e.task, "agent", None), "role", None)}))
+            bus.on(TaskCompletedEvent)(_mark("E", "task", _task_key))
+            bus.on(TaskFailedEvent)(_mark("E", "task", _task_key, args_fn=lambda e: {"error": e.error}))
+            bus.on(LLMCallStartedEvent)(_mark("B", "llm", _llm_key, lambda e: f"llm: {e.model or 'call'}",
+                                              lambda e: {"agent": e.agent_role, "task": e.task_name}))
+            bus.on(LLMCallCompletedEvent)(_mark("E", "llm", _llm_key))
+            bus.on(LLMCallFailedEvent)(_mark("E", "llm", _llm_key, args_fn=lambda e: {"error": e.error}))
+            bus.on(ToolUsageStartedEvent)(_mark("B", "tool", _tool_key, lambda e: f"tool: {e.tool_name}",
+                                                lambda e: {"agent": e.agent_role}))
+            bus.on(ToolUsageFinishedEvent)(_mark("E", "tool", _tool_key, args_fn=lambda e: {"from_cache": e.from_cache}))
+            bus.on(ToolUsageErrorEvent)(_mark("E", "tool", _tool_key, args_fn=lambda e: {"error": str(e.error)}))
+
+    _listener = TraceListener()
+
+
+@contextmanager
+def run_trace(run_id: str, enabled: Optional[bool] = None, out_dir: Optional[str] = None):
+    """Record a Chrome trace for the enclosed crew run; yields the RunTrace (or None when disabled)."""
+    global _active
+    if enabled is None:
+        enabled = os.getenv("CREW_TRACE", "").lower() in ("1", "true", "yes")
+    if not enabled:
+        yield None
+        return
+    try:
+        _install_listener()
+    except ImportError:
+        pass  # still trace our own tool/stage spans
+    tr = RunTrace(run_id)
+    _active = tr
+    try:
+        yield tr
+    finally:
+        # crewAI dispatches handlers on a thread pool; give the final events a moment to land
+        if _listener is not None:
+            tr._crew_done.wait(timeout=2.0)
+        _active = None
+        tr.write(out_dir)
@@ -1,132 +1,85 @@
-import os, json, sqlite3
-from typing import Optional, Dict, List
+import os, sys, json, signal, argparse
+from typing import Optional
 from mcp.server.fastmcp import FastMCP
+from chitrank_crew import memory_core
+from chitrank_crew.metrics import instrument_function, export as export_metrics
 
-# Paths align with your project
-ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
-VEC_DIR = os.path.join(ROOT, "knowledge", "vector_store")
-ST_DB = os.path.join(ROOT, "knowledge", "short_term.sqlite")
+# Storage, paths and the RAG/memory logic all come from chitrank_crew.memory_core,
+# so the server and the crew tools read and write exactly the same stores.
+# Handlers are async: blocking encode/Chroma/SQLite work runs on memory_core's
+# bounded executor and concurrent query encodes are micro-batched, so one slow
+# request doesn't stall the others.
 
-app = FastMCP("crew-memory")
+app = FastMCP(
+    "crew-memory",
+    host=os.getenv("MCP_HOST", "127.0.0.1"),
+    port=int(os.getenv("MCP_PORT", "8000")),
+)
 
 # ---------- SQLite short-term memory ----------
-def _ensure_sqlite():
-    conn = sqlite3.connect(ST_DB)
-    cur = conn.cursor()
-    cur.execute("""
-      CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        session TEXT NOT NULL,
-        agent TEXT NOT NULL,
-        role TEXT NOT NULL,
-        content TEXT NOT NULL,
-        ts REAL NOT NULL
-      );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session, ts);")
-    conn.commit()
-    return conn
-
 @app.tool()
-def st_fetch(session: str, limit: int = 10) -> str:
+@instrument_function("st_fetch", default_agent="mcp")
+async def st_fetch(session: str, limit: int = 10, mode: str = "raw", token_budget: Optional[int] = None) -> str:
     """
     Fetch recent short-term messages from SQLite for a session (JSON).
+    mode='summary' returns the rolling session summary plus the newest messages within token_budget.
     """
-    conn = _ensure_sqlite()
-    rows = conn.execute(
-        "SELECT agent, role, content, ts FROM messages WHERE session=? ORDER BY ts DESC LIMIT ?",
-        (session, limit)
-    ).fetchall()
-    conn.close()
-    return json.dumps([{"agent": a, "role": r, "content": c, "ts": t} for a, r, c, t in rows])
+    return json.dumps(await memory_core.ast_fetch(session, limit, mode, token_budget))
 
 @app.tool()
-def st_store(session: str, agent: str, role: str, content: str) -> str:
+@instrument_function("st_store", default_agent="mcp")
+async def st_store(session: str, agent: str, role: str, content: str) -> str:
     """
     Store a short-term message in SQLite for this session.
     """
-    import time
-    conn = _ensure_sqlite()
-    conn.execute(
-        "INSERT INTO messages(session, agent, role, content, ts) VALUES (?,?,?,?,?)",
-        (session, agent, role, content, time.time())
-    )
-    conn.commit()
-    conn.close()
+    await memory_core.ast_store(session, agent, role, content)
     return "stored"
 
 # ---------- Chroma vector memory / RAG ----------
-_chroma = None
-_embedder = None
-_collection = None
-
-def _ensure_vector_store():
-    global _chroma, _embedder, _collection
-    if _chroma is None:
-        import chromadb
-        from chromadb.config import Settings
-        _chroma = chromadb.PersistentClient(path=VEC_DIR, settings=Settings(anonymized_telemetry=False))
-    if _embedder is None:
-        from sentence_transformers import SentenceTransformer
-        _embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    if _collection is None:
-        _collection = _chroma.get_or_create_collection("agent_long_term")
-    return _collection, _embedder
-
 @app.tool()
-def vector_recall(agent: str, query: str, top_k: int = 5) -> str:
+@instrument_function("vector_recall", default_agent="mcp")
+async def vector_recall(agent: str, query: str, top_k: int = 5) -> str:
     """
     Semantic search in long-term vector memory for an agent. Returns JSON with text, tags, score.
     """
-    col, emb = _ensure_vector_store()
-    qv = emb.encode([query]).tolist()[0]
-    res = col.query(query_embeddings=[qv], n_results=top_k, where={"agent": agent})
-    docs = (res.get("documents") or [[]])[0]
-    metas = (res.get("metadatas") or [[]])[0]
-    dists = (res.get("distances") or [[]])[0]
-    out = []
-    for d, m, s in zip(docs, metas, dists):
-        # Parse tags from JSON string (ChromaDB doesn't support lists in metadata)
-        tags_str = m.get("tags", "[]")
-        try:
-            tags_list = json.loads(tags_str) if isinstance(tags_str, str) else (tags_str or [])
-        except (json.JSONDecodeError, TypeError):
-            tags_list = []
-        out.append({"text": d, "agent": m.get("agent"), "tags": tags_list, "score": float(s)})
-    return json.dumps(out)
+    return json.dumps(await memory_core.avector_recall(agent, query, top_k))
 
 @app.tool()
-def rag_query(query: str, top_k: int = 5, agent_scope: Optional[str] = None, namespace: Optional[str] = None) -> str:
+@instrument_function("rag_query", default_agent="mcp")
+async def rag_query(query: str, top_k: int = 5, agent_scope: Optional[str] = None, namespace: Optional[str] = None,
+                    mode: str = "auto") -> str:
     """
-    Query the RAG vector store (PDF/TXT ingested) filtered by agent_scope/namespace. Returns JSON.
+    Query the RAG store (PDF/TXT ingested) filtered by agent_scope/namespace. Returns JSON.
+    mode: 'auto' (BM25 for identifier lookups), 'hybrid', 'vector' or 'lexical'.
     """
-    col, emb = _ensure_vector_store()
-    where: Dict[str, str] = {}
-    if agent_scope:
-        where["agent_scope"] = agent_scope
-    if namespace:
-        where["namespace"] = namespace
-    qv = emb.encode([query]).tolist()[0]
-    res = col.query(query_embeddings=[qv], n_results=top_k, where=where or None)
-    docs = (res.get("documents") or [[]])[0]
-    metas = (res.get("metadatas") or [[]])[0]
-    dists = (res.get("distances") or [[]])[0]
-    out = []
-    for d, m, s in zip(docs, metas, dists):
-        out.append({
-            "text": d,
-            "path": m.get("path"),
-            "agent_scope": m.get("agent_scope"),
-            "namespace": m.get("namespace"),
-            "score": float(s)
-        })
-    return json.dumps(out)
+    return json.dumps(await memory_core.arag_query(query, top_k=top_k, agent_scope=agent_scope,
+                                                   namespace=namespace, mode=mode))
 
 def run():
     """Run the MCP server (blocks until interrupted)"""
-    # Run as stdio MCP server
-    app.run()
+    parser = argparse.ArgumentParser(prog="mcp_server", description="Crew memory/RAG MCP server")
+    parser.add_argument("--http", action="store_true",
+                        help="Serve streamable HTTP so several clients can share one warm server (default: stdio)")
+    parser.add_argument("--host", default=None, help="HTTP bind host (default: $MCP_HOST or 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=None, help="HTTP port (default: $MCP_PORT or 8000)")
+    parser.add_argument("--prewarm", action="store_true", help="Load the embedding model before serving")
+    args = parser.parse_args(sys.argv[1:])
+
+    transport = "streamable-http" if args.http or os.getenv("MCP_TRANSPORT") == "streamable-http" else "stdio"
+    if args.host:
+        app.settings.host = args.host
+    if args.port:
+        app.settings.port = args.port
+    if args.prewarm:
+        memory_core._ensure_vector_store()
+    # Turn SIGTERM into a normal exit so the metrics below still get written
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        app.run(transport=transport)
+    finally:
+        # Metrics cover the whole server lifetime
+        export_metrics(f"mcp-server-{os.getpid()}")
 
 if __name__ == "__main__":
-    # Run as stdio MCP server
-    run()
\ No newline at end of file
+    # Run as stdio MCP server (pass --http for streamable HTTP)
+    run()
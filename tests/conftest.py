@@ -0,0 +1,26 @@
+import pytest
+
+from chitrank_crew import memory_core
+from chitrank_crew.bench.embedder import HashEmbedder
+
+
+@pytest.fixture
+def rag_store(tmp_path, monkeypatch):
+    """An empty vector store, lexical index and docs directory under tmp_path, with the hashing embedder."""
+    monkeypatch.setattr(memory_core, "VEC_DIR", str(tmp_path / "vector_store"))
+    monkeypatch.setattr(memory_core, "LEX_DB", str(tmp_path / "lexical_index.sqlite"))
+    monkeypatch.setattr(memory_core, "DOCS_DIR", str(tmp_path / "docs"))
+    monkeypatch.setattr(memory_core, "_chroma", None)
+    monkeypatch.setattr(memory_core, "_collection", None)
+    monkeypatch.setattr(memory_core, "_embedder", HashEmbedder())
+    (tmp_path / "docs" / "shared").mkdir(parents=True)
+    return tmp_path
+
+
+def write_docs(root, n=4, scope="shared"):
+    paths = []
+    for i in range(n):
+        path = root / "docs" / scope / f"doc_{i:05d}.txt"
+        path.write_text(" ".join(f"doc{i} word{j} CONFIG_KEY_{i}" for j in range(200)))
+        paths.append(str(path))
+    return paths
@@ -0,0 +1,87 @@
+import gc
+import asyncio
+
+import pytest
+
+from chitrank_crew import memory_core
+
+from conftest import write_docs
+
+
+@pytest.mark.parametrize("query, mode", [
+    ("AUTH_TOKEN_TTL", "lexical"),
+    ("E4012", "lexical"),
+    ("auth-service.yaml MAX_LOGIN_ATTEMPTS", "lexical"),
+    ("JWT token expiry", "hybrid"),
+    ("reset API key", "hybrid"),
+    ("token v2 rollout", "hybrid"),
+    ("why does AUTH_TOKEN_TTL expire early", "hybrid"),
+    ("how do we rotate database credentials", "vector"),
+])
+def test_auto_mode_routing(query, mode):
+    assert memory_core._resolve_mode(query, "auto") == mode
+
+
+def test_explicit_modes_pass_through_and_unknown_is_rejected():
+    assert memory_core._resolve_mode("JWT token expiry", "vector") == "vector"
+    with pytest.raises(ValueError):
+        memory_core._resolve_mode("anything", "semantic")
+
+
+def test_fts_query_matches_identifiers_only_when_present():
+    assert memory_core._fts_query("JWT token expiry") == '"JWT"'
+    assert memory_core._fts_query("AUTH_TOKEN_TTL") == '"AUTH_TOKEN_TTL"'
+    assert memory_core._fts_query("check auth-service.yaml") == '"auth-service.yaml"'
+    assert memory_core._fts_query("how do we rotate") == '"how" OR "do" OR "we" OR "rotate"'
+    # FTS5 syntax in the query is quoted away, not interpreted
+    assert memory_core._fts_query('NEAR(x y) OR "z') == '"NEAR" OR "x" OR "y" OR "OR" OR "z"'
+
+
+def test_source_key_is_docs_relative(rag_store):
+    inside = rag_store / "docs" / "shared" / "a.txt"
+    outside = rag_store / "elsewhere" / "b.txt"
+    assert memory_core.source_key(str(inside)) == "shared/a.txt"
+    assert memory_core.source_key(str(outside)) == str(outside)
+    assert memory_core.source_key(str(rag_store / "docs-old" / "c.txt")) == str(rag_store / "docs-old" / "c.txt")
+
+
+def test_delete_file_chunks_matches_relative_and_absolute_paths(rag_store):
+    path = write_docs(rag_store, n=1)[0]
+    kept = write_docs(rag_store, n=2)[1]
+    for p in (path, kept):
+        memory_core.ingest_file(p, agent_scope="shared", namespace="docs", max_words=120, overlap_words=20)
+    # Chunks a pre-relative-path ingest left behind under the absolute path
+    col = memory_core._ensure_collection()
+    page = col.get(where={"path": "shared/doc_00000.txt"}, include=["documents", "metadatas", "embeddings"])
+    metas = [{**m, "path": path} for m in page["metadatas"]]
+    old_ids = [f"{path}:{m['chunk']}:1700000000000" for m in metas]
+    col.add(ids=old_ids, documents=page["documents"], metadatas=metas, embeddings=page["embeddings"])
+    memory_core.lexical_add(old_ids, page["documents"], metas)
+
+    memory_core.delete_file_chunks(path, "shared", "docs")
+    remaining = col.get(include=["metadatas"])["metadatas"]
+    assert remaining and {m["path"] for m in remaining} == {"shared/doc_00001.txt"}
+    assert memory_core.lexical_count() == len(remaining)
+
+
+def test_hybrid_query_failure_leaves_no_orphaned_task(monkeypatch):
+    async def failing_encode(query):
+        raise RuntimeError("encode failed")
+
+    def failing_lexical(*args):
+        raise RuntimeError("lexical failed")
+
+    monkeypatch.setattr(memory_core, "aencode_query", failing_encode)
+    monkeypatch.setattr(memory_core, "_lexical_hits", failing_lexical)
+
+    async def main():
+        unhandled = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: unhandled.append(ctx))
+        with pytest.raises(RuntimeError):
+            await memory_core.arag_query("why does AUTH_TOKEN_TTL expire", mode="hybrid")
+        await asyncio.sleep(0.1)
+        gc.collect()
+        await asyncio.sleep(0)
+        return unhandled
+
+    assert asyncio.run(main()) == []
@@ -0,0 +1,102 @@
+import re
+import time
+import sqlite3
+
+import pytest
+
+from chitrank_crew import memory_core
+
+
+@pytest.fixture
+def st_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_core, "ST_DB", str(tmp_path / "short_term.sqlite"))
+    monkeypatch.setattr(memory_core, "SUMMARY_EVERY", 1000)  # no background refresh unless a test asks
+    memory_core._summary_backlog.clear()
+    memory_core._summary_pending.clear()
+    return memory_core.ST_DB
+
+
+def _store(session, contents):
+    for content in contents:
+        memory_core.st_store(session, "qa", "note", content)
+
+
+def _indices(lines):
+    return [int(re.search(r"m(\d+)[:.]", line).group(1)) for line in lines]
+
+
+def test_clip_handles_tiny_limits():
+    assert memory_core._clip("hello", 0) == ""
+    assert memory_core._clip("hello", 1) == "…"
+    assert memory_core._clip("hello", 3) == "he…"
+    assert memory_core._clip("hi", 1) == "…"
+    assert memory_core._clip("", 0) == ""
+
+
+@pytest.mark.parametrize("budget", [0, -5])
+def test_summary_rejects_nonpositive_budget(st_db, budget):
+    _store("s", ["m0. hello"])
+    with pytest.raises(ValueError):
+        memory_core.st_fetch("s", mode="summary", token_budget=budget)
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_summary_rejects_nonpositive_limit(st_db, limit):
+    _store("s", ["m0. hello"])
+    with pytest.raises(ValueError):
+        memory_core.st_fetch("s", limit=limit, mode="summary")
+
+
+def test_summary_with_limit_one_covers_every_message(st_db):
+    _store("s", [f"m{i}. short" for i in range(5)])
+    out = memory_core.st_fetch("s", limit=1, mode="summary")
+    assert len(out["recent"]) == 1
+    assert _indices(out["summary"]) == [0, 1, 2, 3]
+
+
+def test_summary_stays_within_budget(st_db):
+    _store("s", [f"m{i}. " + "detail " * 40 for i in range(200)])
+    for budget in (1, 50, 300, 800):
+        out = memory_core.st_fetch("s", limit=50, mode="summary", token_budget=budget)
+        assert out["recent"], "the newest message always comes back"
+        assert out["tokens"] <= budget
+        shown = sum(memory_core.estimate_tokens(r["content"]) for r in out["recent"])
+        shown += sum(memory_core.estimate_tokens(line) for line in out["summary"])
+        assert shown <= budget
+        assert len(out["recent"]) + len(out["summary"]) + out["omitted"] == 200
+
+
+def test_summary_has_no_gaps(st_db):
+    # A long message between short ones: once it doesn't fit, older short lines must not be added
+    contents = [f"m{i}: short" for i in range(20)]
+    contents[12] = "m12: " + "long " * 40  # no sentence break, so its line stays long
+    _store("s", contents)
+    out = memory_core.st_fetch("s", limit=3, mode="summary", token_budget=60)
+    newest_recent = int(out["recent"][-1]["content"].split(":")[0][1:])
+    idx = _indices(out["summary"])
+    assert idx == list(range(newest_recent - len(idx), newest_recent))
+    assert 11 not in idx
+    assert len(out["summary"]) + len(out["recent"]) + out["omitted"] == 20
+
+
+def test_fetch_folds_a_backlog_left_by_other_writers(st_db, monkeypatch):
+    monkeypatch.setattr(memory_core, "SUMMARY_EVERY", 4)
+    _store("s", ["m0. first"])
+    # Rows written by another process: this process's store counter never sees them
+    conn = sqlite3.connect(st_db)
+    conn.executemany("INSERT INTO messages(session, agent, role, content, ts) VALUES (?, ?, ?, ?, ?)",
+                     [("s", "dev", "note", f"m{i}. from elsewhere", time.time()) for i in range(1, 30)])
+    conn.commit()
+    last_id = conn.execute("SELECT MAX(id) FROM messages").fetchone()[0]
+    conn.close()
+
+    memory_core.st_fetch("s", limit=2, mode="summary")
+    deadline = time.time() + 5
+    through_id = 0
+    while time.time() < deadline and through_id < last_id:
+        time.sleep(0.02)
+        conn = sqlite3.connect(st_db)
+        row = conn.execute("SELECT through_id FROM session_summaries WHERE session='s'").fetchone()
+        conn.close()
+        through_id = row[0] if row else 0
+    assert through_id == last_id
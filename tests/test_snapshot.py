@@ -0,0 +1,64 @@
+from collections import Counter
+
+from chitrank_crew import memory_core, snapshot
+
+from conftest import write_docs
+
+
+def _ingest(paths):
+    return sum(memory_core.ingest_file(p, agent_scope="shared", namespace="docs", max_words=120, overlap_words=20)
+               for p in paths)
+
+
+def _paths(hits):
+    return Counter(h["path"] for h in hits)
+
+
+def _switch_store(root, name, monkeypatch):
+    monkeypatch.setattr(memory_core, "VEC_DIR", str(root / name / "vector_store"))
+    monkeypatch.setattr(memory_core, "LEX_DB", str(root / name / "lexical_index.sqlite"))
+    monkeypatch.setattr(memory_core, "_chroma", None)
+    monkeypatch.setattr(memory_core, "_collection", None)
+
+
+def test_import_after_ingest_does_not_duplicate(rag_store, monkeypatch):
+    paths = write_docs(rag_store)
+    # The snapshot is built by a separate ingest of the same docs (CI image, another machine)
+    _switch_store(rag_store, "build", monkeypatch)
+    _ingest(paths)
+    snapshot.export_snapshot(str(rag_store / "snap"))
+    _switch_store(rag_store, "deploy", monkeypatch)
+    chunks = _ingest(paths)
+
+    snapshot.import_snapshot(str(rag_store / "snap"))
+    assert memory_core._ensure_collection().count() == chunks
+    assert memory_core.lexical_count() == chunks
+    hits = memory_core.rag_query("doc0 word1", top_k=chunks, namespace="docs", mode="vector")
+    assert len(hits) == chunks
+    assert all(n == chunks // 4 for n in _paths(hits).values())
+
+
+def test_import_replaces_chunks_stored_under_other_ids(rag_store):
+    paths = write_docs(rag_store)
+    chunks = _ingest(paths)
+    snapshot.export_snapshot(str(rag_store / "snap"))
+    # The same file stored again under ids from an older scheme (ingest timestamp)
+    col = memory_core._ensure_collection()
+    page = col.get(where={"path": "shared/doc_00000.txt"}, include=["documents", "metadatas", "embeddings"])
+    old_ids = [f"shared/doc_00000.txt:{m['chunk']}:1700000000000" for m in page["metadatas"]]
+    col.add(ids=old_ids, documents=page["documents"], metadatas=page["metadatas"], embeddings=page["embeddings"])
+    memory_core.lexical_add(old_ids, page["documents"], page["metadatas"])
+
+    snapshot.import_snapshot(str(rag_store / "snap"))
+    assert col.count() == chunks
+    assert memory_core.lexical_count() == chunks
+    assert not col.get(ids=old_ids)["ids"]
+
+
+def test_reingest_of_unchanged_file_keeps_ids(rag_store):
+    path = write_docs(rag_store, n=1)[0]
+    first = _ingest([path])
+    ids = set(memory_core._ensure_collection().get()["ids"])
+    _ingest([path])
+    assert set(memory_core._ensure_collection().get()["ids"]) == ids
+    assert memory_core._ensure_collection().count() == first